@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from products import products as base_products
+
+
+DEFAULT_SCALES = (10, 100, 1000)
+BENCH_ADMIN_ID = 1
+
+
+def generate_catalog(scale: int) -> list[dict]:
+    return [
+        {"name": f"{item['name']} #{copy}" if copy else item["name"], "price": item["price"]}
+        for item in base_products
+        for copy in range(scale)
+    ]
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def user_script(store: Any, user_id: int) -> list[dict[str, Any]]:
+    from callbacks import CHECKOUT, OPEN_CART, AddToCart, SectionPage, SectionsPage, SubsectionPage
+    from fakes import callback_update, message_update
+
+    snapshot = store.catalog.snapshot
+    section = snapshot.ordered_sections[user_id % len(snapshot.ordered_sections)]
+    subsections = snapshot.section_children(section.id)
+    subsection = subsections[user_id % len(subsections)]
+    products = snapshot.subsection_children(subsection.id)
+    pages = store.page_count(len(products))
+    page = user_id % pages
+    on_page = products[page * store.PAGE_SIZE : (page + 1) * store.PAGE_SIZE]
+
+    updates = [
+        message_update(user_id, "/start"),
+        callback_update(user_id, SectionsPage().pack()),
+        callback_update(user_id, SectionPage(section_id=section.id).pack()),
+        callback_update(user_id, SubsectionPage(subsection_id=subsection.id).pack()),
+        callback_update(user_id, SubsectionPage(subsection_id=subsection.id, page=page).pack()),
+    ]
+    for product in on_page[:3]:
+        updates.append(callback_update(user_id, AddToCart(product_id=product.id).pack()))
+    updates += [
+        callback_update(user_id, OPEN_CART),
+        callback_update(user_id, CHECKOUT),
+        message_update(user_id, "Покупатель"),
+        message_update(user_id, "+70000000000"),
+        message_update(user_id, "Адрес доставки"),
+    ]
+    return updates
+
+
+async def run_scale(scale: int, users: int) -> dict[str, Any]:
+    from aiogram.types import Update
+
+    import bot as store
+    from fakes import FakeSession, fake_bot
+
+    started = time.perf_counter()
+    store.init_db(generate_catalog(scale))
+    init_seconds = time.perf_counter() - started
+
+    session = FakeSession()
+    bot = fake_bot(session)
+    dp = store.build_dispatcher()
+    await dp.emit_startup(bot=bot)
+
+    latencies: list[float] = []
+
+    async def play(user_id: int) -> None:
+        for raw in user_script(store, user_id):
+            update = Update.model_validate(raw, context={"bot": bot})
+            begin = time.perf_counter()
+            await dp.feed_update(bot, update)
+            latencies.append(time.perf_counter() - begin)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(play(user_id) for user_id in range(1000, 1000 + users)))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await dp.emit_shutdown(dispatcher=dp, bot=bot)
+    store.db.close()
+
+    return {
+        "scale": scale,
+        "products": len(store.catalog.snapshot.products),
+        "init_ms": init_seconds * 1000,
+        "updates": len(latencies),
+        "updates_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_alloc_mb": peak / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "api_calls": len(session.requests),
+    }
+
+
+def run_child(scale: int, users: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update(
+            BOT_TOKEN="42:FAKE-TOKEN-FOR-LOCAL-RUNS",
+            ADMIN_ID=str(BENCH_ADMIN_ID),
+            DB_PATH=str(Path(tmp) / "bench.db"),
+            BOT_MODE="polling",
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--scales", str(scale), "--users", str(users)],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the store bot")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES))
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_scale(args.scales[0], args.users))))
+        return
+
+    print(f"{'scale':>6} {'products':>9} {'init ms':>9} {'upd/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'alloc MB':>9} {'rss MB':>8}")
+    for scale in args.scales:
+        result = run_child(scale, args.users)
+        print(
+            f"{result['scale']:>6} {result['products']:>9} {result['init_ms']:>9.1f} "
+            f"{result['updates_per_sec']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['peak_alloc_mb']:>9.1f} {result['max_rss_mb']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,766 +1,1166 @@
- import asyncio
--import csv
--import io
- import math
--import re
--from dataclasses import dataclass
-+import sqlite3
-+from pathlib import Path
- from typing import Dict
--from urllib.parse import parse_qs, urlparse
--from urllib.request import urlopen
- 
- from aiogram import Bot, Dispatcher, F
--from aiogram.filters import CommandStart
-+from aiogram.filters import Command, CommandStart
- from aiogram.fsm.context import FSMContext
- from aiogram.fsm.state import State, StatesGroup
- from aiogram.fsm.storage.memory import MemoryStorage
- from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
- 
- from config import load_settings
-+from products import products as products_data
- 
- 
- PAGE_SIZE = 10
--
--
--@dataclass(frozen=True)
--class Product:
--    id: str
--    title: str
--    description: str
--    price: int
--
--
--FALLBACK_PRODUCTS = [
--    Product("pod_1", "POD система Aegis", "Компактная POD-система, 1100 mAh.", 2890),
--    Product("salt_1", "Жидкость Salt Mango", "30 мл, крепость 20 мг.", 690),
--    Product("coil_1", "Испаритель X2", "Сетчатый испаритель 0.8 Ω.", 390),
--]
-+MARKER_TOKENS = {"HARD", "MEDIUM", "LIGHT", "V2"}
-+DB_PATH = Path("bot_store.db")
- 
- 
- class Checkout(StatesGroup):
-     waiting_name = State()
-     waiting_phone = State()
-     waiting_address = State()
- 
- 
- settings = load_settings()
--PRODUCTS: list[Product] = []
--
--
--def apply_markup(base_price: float) -> int:
--    if base_price <= 200:
--        multiplier = 1.8
--    elif base_price <= 250:
--        multiplier = 1.5
--    else:
--        multiplier = 1.35
--    return int(math.ceil(base_price * multiplier))
--
--
--def _extract_numeric_price(raw_value: str) -> float | None:
--    cleaned = raw_value.strip().replace("\xa0", " ")
--    cleaned = cleaned.replace("₽", "").replace("руб.", "").replace("р.", "")
--    cleaned = cleaned.replace(" ", "").replace(",", ".")
--    if not cleaned:
--        return None
--
--    match = re.search(r"\d+(?:\.\d+)?", cleaned)
--    if not match:
--        return None
--
--    try:
--        return float(match.group(0))
--    except ValueError:
--        return None
--
--
--def _normalize_header(value: str) -> str:
--    return value.strip().lower().replace("ё", "е")
--
--
--def _pick_columns(headers: list[str]) -> tuple[int, int] | None:
--    normalized = [_normalize_header(h) for h in headers]
--
--    name_candidates = ["название", "товар", "наименование", "product", "name"]
--    price_candidates = ["цена", "прайс", "стоимость", "price"]
--
--    name_index = next((i for i, h in enumerate(normalized) if any(c in h for c in name_candidates)), None)
--    price_index = next((i for i, h in enumerate(normalized) if any(c in h for c in price_candidates)), None)
- 
--    if name_index is not None and price_index is not None:
--        return name_index, price_index
- 
--    if len(headers) >= 2:
--        return 0, 1
-+def round_to_5(price: int) -> int:
-+    return int(round(price / 5) * 5)
- 
--    return None
- 
-+def split_line_and_flavor(name: str) -> tuple[str, str]:
-+    tokens = name.split()
-+    marker_indexes = [idx for idx, token in enumerate(tokens) if token.upper() in MARKER_TOKENS]
- 
--def _google_sheet_to_csv_url(url: str) -> str:
--    if "docs.google.com/spreadsheets" not in url:
--        return url
-+    if marker_indexes:
-+        marker_index = marker_indexes[-1]
-+        line = " ".join(tokens[: marker_index + 1]).strip()
-+        flavor = " ".join(tokens[marker_index + 1 :]).strip()
-+    else:
-+        line = tokens[0].strip() if tokens else name.strip()
-+        flavor = " ".join(tokens[1:]).strip()
- 
--    sheet_id_match = re.search(r"/d/([a-zA-Z0-9-_]+)", url)
--    if not sheet_id_match:
--        return url
-+    return line or name.strip(), flavor or "Классический"
- 
--    parsed = urlparse(url)
--    query_gid = parse_qs(parsed.query).get("gid", [None])[0]
--    fragment_gid = parse_qs(parsed.fragment).get("gid", [None])[0]
--    gid = query_gid or fragment_gid or "0"
- 
--    return f"https://docs.google.com/spreadsheets/d/{sheet_id_match.group(1)}/export?format=csv&gid={gid}"
-+def db_connect() -> sqlite3.Connection:
-+    conn = sqlite3.connect(DB_PATH)
-+    conn.row_factory = sqlite3.Row
-+    return conn
- 
- 
--def parse_price_products(csv_text: str) -> list[Product]:
--    reader = csv.reader(io.StringIO(csv_text))
--    rows = [row for row in reader if any(cell.strip() for cell in row)]
--    if not rows:
--        return []
-+def init_db() -> None:
-+    with db_connect() as conn:
-+        conn.execute(
-+            """
-+            CREATE TABLE IF NOT EXISTS users (
-+                user_id INTEGER PRIMARY KEY,
-+                first_seen_at TEXT DEFAULT CURRENT_TIMESTAMP
-+            )
-+            """
-+        )
-+        conn.execute(
-+            """
-+            CREATE TABLE IF NOT EXISTS sections (
-+                id INTEGER PRIMARY KEY AUTOINCREMENT,
-+                name TEXT NOT NULL UNIQUE
-+            )
-+            """
-+        )
-+        conn.execute(
-+            """
-+            CREATE TABLE IF NOT EXISTS subsections (
-+                id INTEGER PRIMARY KEY AUTOINCREMENT,
-+                section_id INTEGER NOT NULL,
-+                name TEXT NOT NULL,
-+                FOREIGN KEY(section_id) REFERENCES sections(id) ON DELETE CASCADE
-+            )
-+            """
-+        )
-+        conn.execute(
-+            """
-+            CREATE TABLE IF NOT EXISTS products (
-+                id INTEGER PRIMARY KEY AUTOINCREMENT,
-+                subsection_id INTEGER NOT NULL,
-+                name TEXT NOT NULL,
-+                price INTEGER NOT NULL,
-+                FOREIGN KEY(subsection_id) REFERENCES subsections(id) ON DELETE CASCADE
-+            )
-+            """
-+        )
-+        conn.execute("PRAGMA foreign_keys=ON")
- 
--    columns = _pick_columns(rows[0])
--    data_rows = rows[1:] if columns and rows[0] else rows
-+        section_count = conn.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
-+        if section_count == 0:
-+            seed_catalog(conn)
- 
--    if columns is None:
--        return []
- 
--    name_col, price_col = columns
--    products: list[Product] = []
-+def seed_catalog(conn: sqlite3.Connection) -> None:
-+    conn.execute("INSERT INTO sections(name) VALUES (?)", ("Жидкости",))
-+    section_id = conn.execute("SELECT id FROM sections WHERE name = ?", ("Жидкости",)).fetchone()[0]
- 
--    for idx, row in enumerate(data_rows, start=1):
--        if len(row) <= max(name_col, price_col):
--            continue
-+    grouped: dict[str, list[tuple[str, int]]] = {}
-+    for item in products_data:
-+        line_name, flavor_name = split_line_and_flavor(item["name"])
-+        grouped.setdefault(line_name, []).append((flavor_name, round_to_5(int(item["price"]))))
- 
--        title = row[name_col].strip()
--        base_price = _extract_numeric_price(row[price_col])
--        if not title or base_price is None:
--            continue
--
--        products.append(
--            Product(
--                id=f"price_{idx}",
--                title=title,
--                description=f"Базовая цена: {int(round(base_price))} ₽",
--                price=apply_markup(base_price),
--            )
-+    for line_name, flavors in grouped.items():
-+        conn.execute(
-+            "INSERT INTO subsections(section_id, name) VALUES (?, ?)",
-+            (section_id, line_name),
-+        )
-+        subsection_id = conn.execute(
-+            "SELECT id FROM subsections WHERE section_id = ? AND name = ?",
-+            (section_id, line_name),
-+        ).fetchone()[0]
-+
-+        conn.executemany(
-+            "INSERT INTO products(subsection_id, name, price) VALUES (?, ?, ?)",
-+            [(subsection_id, flavor, price) for flavor, price in flavors],
-         )
- 
--    return products
--
--
--def load_catalog_products() -> list[Product]:
--    if not settings.catalog_url:
--        return FALLBACK_PRODUCTS
- 
--    source_url = _google_sheet_to_csv_url(settings.catalog_url)
-+def is_admin(user_id: int) -> bool:
-+    return user_id == settings.admin_id
- 
--    try:
--        with urlopen(source_url, timeout=30) as response:
--            text = response.read().decode("utf-8-sig", errors="ignore")
--        parsed = parse_price_products(text)
--        if parsed:
--            return parsed
--    except Exception:
--        pass
- 
--    return FALLBACK_PRODUCTS
-+def register_user(user_id: int) -> None:
-+    with db_connect() as conn:
-+        conn.execute("INSERT OR IGNORE INTO users(user_id) VALUES (?)", (user_id,))
- 
- 
- def main_menu() -> InlineKeyboardMarkup:
-     return InlineKeyboardMarkup(
-         inline_keyboard=[
-             [InlineKeyboardButton(text="🛍 Каталог", callback_data="open_catalog:0")],
-             [InlineKeyboardButton(text="🧺 Корзина", callback_data="open_cart")],
-             [InlineKeyboardButton(text="ℹ️ О магазине", callback_data="about")],
-         ]
-     )
- 
- 
--def catalog_keyboard(page: int) -> InlineKeyboardMarkup:
-+def sections_keyboard(page: int) -> InlineKeyboardMarkup:
-+    with db_connect() as conn:
-+        sections = conn.execute("SELECT id, name FROM sections ORDER BY id").fetchall()
-+
-     start = page * PAGE_SIZE
-     end = start + PAGE_SIZE
--    rows = []
--    for item in PRODUCTS[start:end]:
--        rows.append(
--            [
--                InlineKeyboardButton(
--                    text=f"{item.title[:45]} — {item.price} ₽",
--                    callback_data=f"add:{item.id}:{page}",
--                )
--            ]
--        )
-+    rows = [
-+        [InlineKeyboardButton(text=row["name"], callback_data=f"open_section:{row['id']}:0")]
-+        for row in sections[start:end]
-+    ]
- 
--    nav_row = []
-+    nav = []
-     if page > 0:
--        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"open_catalog:{page - 1}"))
--    if end < len(PRODUCTS):
--        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"open_catalog:{page + 1}"))
--    if nav_row:
--        rows.append(nav_row)
-+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"open_catalog:{page - 1}"))
-+    if end < len(sections):
-+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"open_catalog:{page + 1}"))
-+    if nav:
-+        rows.append(nav)
- 
-     rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back_main")])
-     return InlineKeyboardMarkup(inline_keyboard=rows)
- 
- 
--def cart_keyboard() -> InlineKeyboardMarkup:
--    return InlineKeyboardMarkup(
--        inline_keyboard=[
--            [InlineKeyboardButton(text="✅ Оформить заказ", callback_data="checkout")],
--            [InlineKeyboardButton(text="🗑 Очистить корзину", callback_data="clear_cart")],
--            [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_main")],
-+def subsections_keyboard(section_id: int, page: int) -> InlineKeyboardMarkup:
-+    with db_connect() as conn:
-+        subs = conn.execute(
-+            "SELECT id, name FROM subsections WHERE section_id = ? ORDER BY id",
-+            (section_id,),
-+        ).fetchall()
-+
-+    start = page * PAGE_SIZE
-+    end = start + PAGE_SIZE
-+    rows = [
-+        [InlineKeyboardButton(text=row["name"][:55], callback_data=f"open_subsection:{row['id']}:0")]
-+        for row in subs[start:end]
-+    ]
-+
-+    nav = []
-+    if page > 0:
-+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"open_section:{section_id}:{page - 1}"))
-+    if end < len(subs):
-+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"open_section:{section_id}:{page + 1}"))
-+    if nav:
-+        rows.append(nav)
-+
-+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="open_catalog:0")])
-+    return InlineKeyboardMarkup(inline_keyboard=rows)
-+
-+
-+def products_keyboard(subsection_id: int, page: int) -> InlineKeyboardMarkup:
-+    with db_connect() as conn:
-+        items = conn.execute(
-+            "SELECT id, name, price FROM products WHERE subsection_id = ? ORDER BY id",
-+            (subsection_id,),
-+        ).fetchall()
-+
-+    start = page * PAGE_SIZE
-+    end = start + PAGE_SIZE
-+    rows = [
-+        [
-+            InlineKeyboardButton(
-+                text=f"{row['name'][:40]} — {row['price']} ₽",
-+                callback_data=f"add:{row['id']}:{subsection_id}:{page}",
-+            )
-         ]
--    )
-+        for row in items[start:end]
-+    ]
- 
-+    nav = []
-+    if page > 0:
-+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"open_subsection:{subsection_id}:{page - 1}"))
-+    if end < len(items):
-+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"open_subsection:{subsection_id}:{page + 1}"))
-+    if nav:
-+        rows.append(nav)
-+
-+    with db_connect() as conn:
-+        section_id = conn.execute(
-+            "SELECT section_id FROM subsections WHERE id = ?",
-+            (subsection_id,),
-+        ).fetchone()[0]
-+
-+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=f"open_section:{section_id}:0")])
-+    return InlineKeyboardMarkup(inline_keyboard=rows)
- 
--def find_product(product_id: str) -> Product | None:
--    return next((p for p in PRODUCTS if p.id == product_id), None)
-+
-+def find_product(product_id: int) -> sqlite3.Row | None:
-+    with db_connect() as conn:
-+        return conn.execute("SELECT id, name, price FROM products WHERE id = ?", (product_id,)).fetchone()
- 
- 
- def format_cart(cart: Dict[str, int]) -> str:
-     if not cart:
-         return "Ваша корзина пуста."
- 
-     lines = ["🧺 Ваша корзина:"]
-     total = 0
--    for pid, qty in cart.items():
--        product = find_product(pid)
--        if not product:
--            continue
--        subtotal = product.price * qty
--        total += subtotal
--        lines.append(f"• {product.title} × {qty} = {subtotal} ₽")
-+
-+    with db_connect() as conn:
-+        for pid, qty in cart.items():
-+            row = conn.execute("SELECT name, price FROM products WHERE id = ?", (int(pid),)).fetchone()
-+            if not row:
-+                continue
-+            subtotal = row["price"] * qty
-+            total += subtotal
-+            lines.append(f"• {row['name']} × {qty} = {subtotal} ₽")
- 
-     lines.append(f"\nИтого: {total} ₽")
-     return "\n".join(lines)
- 
- 
- async def on_start(message: Message, state: FSMContext) -> None:
-     await state.clear()
--    await message.answer(
--        "Привет! Это бот-магазин. Выберите действие:",
--        reply_markup=main_menu(),
--    )
-+    register_user(message.from_user.id)
-+    await message.answer("Привет! Это бот-магазин. Выберите действие:", reply_markup=main_menu())
- 
- 
- async def open_catalog(callback: CallbackQuery) -> None:
-     page = int(callback.data.split(":", maxsplit=1)[1])
--    page_total = max(1, math.ceil(len(PRODUCTS) / PAGE_SIZE))
-+    with db_connect() as conn:
-+        total = conn.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
-+    page_total = max(1, math.ceil(total / PAGE_SIZE))
-+
-+    await callback.message.edit_text(
-+        f"Каталог (страница {page + 1}/{page_total}). Выберите раздел:",
-+        reply_markup=sections_keyboard(page),
-+    )
-+    await callback.answer()
-+
-+
-+async def open_section(callback: CallbackQuery) -> None:
-+    _, section_id_raw, page_raw = callback.data.split(":", maxsplit=2)
-+    section_id = int(section_id_raw)
-+    page = int(page_raw)
-+
-+    with db_connect() as conn:
-+        section = conn.execute("SELECT name FROM sections WHERE id = ?", (section_id,)).fetchone()
-+        total = conn.execute("SELECT COUNT(*) FROM subsections WHERE section_id = ?", (section_id,)).fetchone()[0]
-+
-+    if not section:
-+        await callback.answer("Раздел не найден", show_alert=True)
-+        return
-+
-+    page_total = max(1, math.ceil(total / PAGE_SIZE))
-     await callback.message.edit_text(
--        f"Каталог (страница {page + 1}/{page_total}). Выберите товар:",
--        reply_markup=catalog_keyboard(page),
-+        f"{section['name']} (страница {page + 1}/{page_total}). Выберите подраздел:",
-+        reply_markup=subsections_keyboard(section_id, page),
-+    )
-+    await callback.answer()
-+
-+
-+async def open_subsection(callback: CallbackQuery) -> None:
-+    _, subsection_id_raw, page_raw = callback.data.split(":", maxsplit=2)
-+    subsection_id = int(subsection_id_raw)
-+    page = int(page_raw)
-+
-+    with db_connect() as conn:
-+        subsection = conn.execute("SELECT name FROM subsections WHERE id = ?", (subsection_id,)).fetchone()
-+        total = conn.execute("SELECT COUNT(*) FROM products WHERE subsection_id = ?", (subsection_id,)).fetchone()[0]
-+
-+    if not subsection:
-+        await callback.answer("Подраздел не найден", show_alert=True)
-+        return
-+
-+    page_total = max(1, math.ceil(total / PAGE_SIZE))
-+    await callback.message.edit_text(
-+        f"{subsection['name']}\nВкусы (страница {page + 1}/{page_total}):",
-+        reply_markup=products_keyboard(subsection_id, page),
-     )
-     await callback.answer()
- 
- 
- async def add_to_cart(callback: CallbackQuery, state: FSMContext) -> None:
--    _, product_id, page = callback.data.split(":", maxsplit=2)
-+    _, product_id_raw, subsection_id_raw, page_raw = callback.data.split(":", maxsplit=3)
-+    product_id = int(product_id_raw)
-+    subsection_id = int(subsection_id_raw)
-+    page = int(page_raw)
-+
-     product = find_product(product_id)
-     if not product:
-         await callback.answer("Товар не найден", show_alert=True)
-         return
- 
-     data = await state.get_data()
-     cart = data.get("cart", {})
--    cart[product.id] = cart.get(product.id, 0) + 1
-+    key = str(product_id)
-+    cart[key] = cart.get(key, 0) + 1
-     await state.update_data(cart=cart)
- 
-     await callback.answer("Добавлено в корзину ✅")
--    await callback.message.edit_reply_markup(reply_markup=catalog_keyboard(int(page)))
-+    await callback.message.edit_reply_markup(reply_markup=products_keyboard(subsection_id, page))
- 
- 
- async def open_cart(callback: CallbackQuery, state: FSMContext) -> None:
-     data = await state.get_data()
-     cart = data.get("cart", {})
-     await callback.message.edit_text(format_cart(cart), reply_markup=cart_keyboard())
-     await callback.answer()
- 
- 
-+def cart_keyboard() -> InlineKeyboardMarkup:
-+    return InlineKeyboardMarkup(
-+        inline_keyboard=[
-+            [InlineKeyboardButton(text="✅ Оформить заказ", callback_data="checkout")],
-+            [InlineKeyboardButton(text="🗑 Очистить корзину", callback_data="clear_cart")],
-+            [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_main")],
-+        ]
-+    )
-+
-+
- async def clear_cart(callback: CallbackQuery, state: FSMContext) -> None:
-     await state.update_data(cart={})
-     await callback.message.edit_text("Корзина очищена.", reply_markup=main_menu())
-     await callback.answer()
- 
- 
- async def about(callback: CallbackQuery) -> None:
-     await callback.message.edit_text(
--        "Каталог загружается из прайс-листа, а цены автоматически пересчитываются с наценкой.",
-+        "Мы предлагаем большой выбор качественных жидкостей и аксессуаров для вейпа.\n"
-+        "Только проверенные бренды, актуальные вкусы и быстрая доставка.\n"
-+        "Постоянные акции и скидки для наших клиентов.",
-         reply_markup=main_menu(),
-     )
-     await callback.answer()
- 
- 
- async def back_main(callback: CallbackQuery) -> None:
-     await callback.message.edit_text("Главное меню:", reply_markup=main_menu())
-     await callback.answer()
- 
- 
- async def checkout_start(callback: CallbackQuery, state: FSMContext) -> None:
-     data = await state.get_data()
-     if not data.get("cart"):
-         await callback.answer("Корзина пуста", show_alert=True)
-         return
- 
-     await state.set_state(Checkout.waiting_name)
-     await callback.message.answer("Введите ваше имя для заказа:")
-     await callback.answer()
- 
- 
- async def checkout_name(message: Message, state: FSMContext) -> None:
-     await state.update_data(customer_name=message.text)
-     await state.set_state(Checkout.waiting_phone)
-     await message.answer("Введите телефон для связи:")
- 
- 
- async def checkout_phone(message: Message, state: FSMContext) -> None:
-     await state.update_data(customer_phone=message.text)
-     await state.set_state(Checkout.waiting_address)
-     await message.answer("Введите адрес доставки (или самовывоза):")
- 
- 
- async def checkout_address(message: Message, state: FSMContext, bot: Bot) -> None:
-     data = await state.get_data()
-     cart = data.get("cart", {})
- 
--    await state.update_data(customer_address=message.text)
-     summary = format_cart(cart)
--
-     order_text = (
-         "🧾 Новый заказ\n"
-         f"Покупатель: {data.get('customer_name')}\n"
-         f"Телефон: {data.get('customer_phone')}\n"
-         f"Адрес: {message.text}\n\n"
-         f"{summary}"
-     )
- 
-     await bot.send_message(settings.admin_id, order_text)
-     await message.answer("Спасибо! Заказ отправлен администратору ✅")
-     await state.clear()
-     await message.answer("Главное меню:", reply_markup=main_menu())
- 
- 
-+ADMIN_HELP = (
-+    "Команды администратора:\n"
-+    "/add_section <название>\n"
-+    "/del_section <section_id>\n"
-+    "/add_subsection <section_id> | <название>\n"
-+    "/del_subsection <subsection_id>\n"
-+    "/add_product <subsection_id> | <название> | <цена>\n"
-+    "/del_product <product_id>\n"
-+    "/users_count\n"
-+    "/broadcast <текст>"
-+)
-+
-+
-+async def admin_help(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    await message.answer(ADMIN_HELP)
-+
-+
-+async def add_section_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    name = message.text.replace("/add_section", "", 1).strip()
-+    if not name:
-+        await message.answer("Формат: /add_section <название>")
-+        return
-+    with db_connect() as conn:
-+        conn.execute("INSERT INTO sections(name) VALUES (?)", (name,))
-+    await message.answer("Раздел добавлен ✅")
-+
-+
-+async def del_section_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    try:
-+        section_id = int(message.text.replace("/del_section", "", 1).strip())
-+    except ValueError:
-+        await message.answer("Формат: /del_section <section_id>")
-+        return
-+    with db_connect() as conn:
-+        conn.execute("DELETE FROM sections WHERE id = ?", (section_id,))
-+    await message.answer("Раздел удалён ✅")
-+
-+
-+async def add_subsection_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    payload = message.text.replace("/add_subsection", "", 1).strip()
-+    if "|" not in payload:
-+        await message.answer("Формат: /add_subsection <section_id> | <название>")
-+        return
-+    section_raw, name = [part.strip() for part in payload.split("|", maxsplit=1)]
-+    try:
-+        section_id = int(section_raw)
-+    except ValueError:
-+        await message.answer("section_id должен быть числом")
-+        return
-+    with db_connect() as conn:
-+        conn.execute("INSERT INTO subsections(section_id, name) VALUES (?, ?)", (section_id, name))
-+    await message.answer("Подраздел добавлен ✅")
-+
-+
-+async def del_subsection_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    try:
-+        subsection_id = int(message.text.replace("/del_subsection", "", 1).strip())
-+    except ValueError:
-+        await message.answer("Формат: /del_subsection <subsection_id>")
-+        return
-+    with db_connect() as conn:
-+        conn.execute("DELETE FROM subsections WHERE id = ?", (subsection_id,))
-+    await message.answer("Подраздел удалён ✅")
-+
-+
-+async def add_product_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    payload = message.text.replace("/add_product", "", 1).strip()
-+    parts = [part.strip() for part in payload.split("|", maxsplit=2)]
-+    if len(parts) != 3:
-+        await message.answer("Формат: /add_product <subsection_id> | <название> | <цена>")
-+        return
-+    subsection_raw, name, price_raw = parts
-+    try:
-+        subsection_id = int(subsection_raw)
-+        price = round_to_5(int(price_raw))
-+    except ValueError:
-+        await message.answer("subsection_id и цена должны быть числами")
-+        return
-+    with db_connect() as conn:
-+        conn.execute(
-+            "INSERT INTO products(subsection_id, name, price) VALUES (?, ?, ?)",
-+            (subsection_id, name, price),
-+        )
-+    await message.answer("Товар добавлен ✅")
-+
-+
-+async def del_product_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    try:
-+        product_id = int(message.text.replace("/del_product", "", 1).strip())
-+    except ValueError:
-+        await message.answer("Формат: /del_product <product_id>")
-+        return
-+    with db_connect() as conn:
-+        conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
-+    await message.answer("Товар удалён ✅")
-+
-+
-+async def users_count_cmd(message: Message) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    with db_connect() as conn:
-+        count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
-+    await message.answer(f"Пользователей, использовавших бота: {count}")
-+
-+
-+async def broadcast_cmd(message: Message, bot: Bot) -> None:
-+    if not is_admin(message.from_user.id):
-+        return
-+    text = message.text.replace("/broadcast", "", 1).strip()
-+    if not text:
-+        await message.answer("Формат: /broadcast <текст>")
-+        return
-+
-+    with db_connect() as conn:
-+        user_ids = [row[0] for row in conn.execute("SELECT user_id FROM users").fetchall()]
-+
-+    sent = 0
-+    for user_id in user_ids:
-+        try:
-+            await bot.send_message(user_id, text)
-+            sent += 1
-+        except Exception:
-+            continue
-+
-+    await message.answer(f"Рассылка завершена. Отправлено: {sent}")
-+
-+
- async def main() -> None:
--    global PRODUCTS
--    PRODUCTS = load_catalog_products()
-+    init_db()
- 
-     bot = Bot(settings.bot_token)
-     dp = Dispatcher(storage=MemoryStorage())
- 
-     dp.message.register(on_start, CommandStart())
-+    dp.message.register(admin_help, Command("admin"))
-+    dp.message.register(add_section_cmd, Command("add_section"))
-+    dp.message.register(del_section_cmd, Command("del_section"))
-+    dp.message.register(add_subsection_cmd, Command("add_subsection"))
-+    dp.message.register(del_subsection_cmd, Command("del_subsection"))
-+    dp.message.register(add_product_cmd, Command("add_product"))
-+    dp.message.register(del_product_cmd, Command("del_product"))
-+    dp.message.register(users_count_cmd, Command("users_count"))
-+    dp.message.register(broadcast_cmd, Command("broadcast"))
- 
-     dp.callback_query.register(open_catalog, F.data.startswith("open_catalog:"))
-+    dp.callback_query.register(open_section, F.data.startswith("open_section:"))
-+    dp.callback_query.register(open_subsection, F.data.startswith("open_subsection:"))
-     dp.callback_query.register(open_cart, F.data == "open_cart")
-     dp.callback_query.register(about, F.data == "about")
-     dp.callback_query.register(back_main, F.data == "back_main")
-     dp.callback_query.register(clear_cart, F.data == "clear_cart")
-     dp.callback_query.register(checkout_start, F.data == "checkout")
-     dp.callback_query.register(add_to_cart, F.data.startswith("add:"))
- 
-     dp.message.register(checkout_name, Checkout.waiting_name)
-     dp.message.register(checkout_phone, Checkout.waiting_phone)
-     dp.message.register(checkout_address, Checkout.waiting_address)
- 
-     await dp.start_polling(bot)
- 
- 
- if __name__ == "__main__":
-     asyncio.run(main())
+import asyncio
+import csv
+import io
+import math
+import sqlite3
+from functools import lru_cache
+from typing import Dict
+
+import aiohttp
+from aiogram import Bot, Dispatcher, F
+from aiogram.exceptions import TelegramAPIError
+from aiogram.filters import Command, CommandStart, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputMediaPhoto,
+    InputTextMessageContent,
+    Message,
+)
+
+from broadcast import Broadcaster
+from callbacks import (
+    ABOUT,
+    BACK_MAIN,
+    CHECKOUT,
+    CHECKOUT_MANUAL,
+    CLEAR_CART,
+    NEW_ADDRESS,
+    NOOP,
+    OPEN_CART,
+    REPEAT_ORDER,
+    AddToCart,
+    CartEdit,
+    CartRemove,
+    SavedCheckout,
+    SearchPage,
+    SectionPage,
+    SectionsPage,
+    SubsectionPage,
+    SubsectionPhotos,
+)
+from cart import CartSummary, CartUpdates, summarize_cart
+from catalog import Catalog, CatalogSnapshot, PageCache, Product, round_to_5, split_line_and_flavor
+from catalog_io import DEFAULT_SECTION, CatalogImportError, export_catalog, import_document
+from cluster import CATALOG_CHANGED, NOTIFY_ORDER, RUN_BROADCAST, WorkerLink, run_supervisor
+from config import load_settings
+from customers import CustomerProfile, last_order_items, load_profile
+from db import Database
+from inventory import OutOfStockError, ReservationSweeper, StockLevels, reserve_stock
+from metrics import HandlerTimingMiddleware, Metrics, start_metrics_server
+from migrations import LATEST_VERSION, migrate
+from orders import OrderNotifier, place_order, recent_orders
+from outgoing import OutgoingRequests
+from photos import PhotoCache, image_input, sent_file_id
+from price_sync import PriceSync
+from products import products as products_data
+from scheduling import ChatEventIsolation, PollingBackpressure, UpdateLimiter
+from search import index_is_current, rebuild_index, search_products
+from storage import create_storage
+from users import UserRegistry
+from webhook import run_webhook
+
+
+PAGE_SIZE = 10
+KEYBOARD_CACHE_SIZE = 512
+CART_CACHE_SIZE = 1024
+CART_UPDATE_DELAY = 0.6
+MIN_SEARCH_QUERY = 3
+INLINE_PAGE_SIZE = 20
+
+
+class Checkout(StatesGroup):
+    choosing_details = State()
+    waiting_name = State()
+    waiting_phone = State()
+    waiting_address = State()
+
+
+settings = load_settings()
+metrics = Metrics(settings.metrics_enabled)
+db = Database(
+    settings.db_path,
+    settings.db_pool_size,
+    settings.db_workers,
+    observe=metrics.observe_job if metrics.enabled else None,
+)
+catalog = Catalog()
+keyboard_pages = PageCache(KEYBOARD_CACHE_SIZE)
+cart_summaries = PageCache(CART_CACHE_SIZE)
+cart_keyboards = PageCache(CART_CACHE_SIZE)
+outgoing = OutgoingRequests()
+photo_cache = PhotoCache(db)
+event_isolation = ChatEventIsolation(settings.update_max_pending)
+cart_updates = CartUpdates(CART_UPDATE_DELAY, event_isolation)
+update_limiter = UpdateLimiter(settings.update_concurrency)
+polling_backpressure = PollingBackpressure(event_isolation)
+broadcaster = Broadcaster(db, settings.broadcast_rate, settings.broadcast_concurrency)
+order_notifier = OrderNotifier(db, settings.admin_id)
+user_registry = UserRegistry(db, settings.user_flush_interval)
+worker_link = WorkerLink(settings.worker_index)
+is_primary = settings.worker_index in (None, 0)
+price_sync = PriceSync(db, settings.catalog_url, settings.catalog_sync_interval, lambda: refresh_catalog())
+reservation_sweeper = ReservationSweeper(db, lambda levels: sync_availability(levels))
+
+metrics.gauge("db_queued_jobs", lambda: db.queued_jobs)
+metrics.gauge("catalog_version", lambda: catalog.version)
+metrics.gauge("keyboard_cache_hits", lambda: keyboard_pages.hits)
+metrics.gauge("keyboard_cache_misses", lambda: keyboard_pages.misses)
+metrics.gauge("photo_cache_hits", lambda: photo_cache.hits)
+metrics.gauge("photo_cache_misses", lambda: photo_cache.misses)
+metrics.gauge("pending_order_notifications", lambda: order_notifier.pending)
+metrics.gauge("failed_order_notifications", lambda: order_notifier.failed)
+metrics.gauge("failed_reservation_sweeps", lambda: reservation_sweeper.failed)
+metrics.gauge("failed_price_syncs", lambda: price_sync.failed)
+metrics.gauge("failed_broadcasts", lambda: broadcaster.failed)
+metrics.gauge("pending_user_registrations", lambda: user_registry.pending)
+metrics.gauge("pending_cart_updates", lambda: cart_updates.pending)
+metrics.gauge("api_edits_skipped", lambda: outgoing.skipped_edits)
+metrics.gauge("api_edits_coalesced", lambda: outgoing.coalesced_edits)
+metrics.gauge("api_flood_waits", lambda: outgoing.flood_waits)
+metrics.gauge("api_flood_wait_seconds", lambda: outgoing.flood_wait_seconds)
+metrics.gauge("api_active_chats", lambda: outgoing.active_chats)
+metrics.gauge("updates_pending", lambda: event_isolation.pending)
+metrics.gauge("updates_running", lambda: update_limiter.running)
+
+
+def init_db(seed_items: list[dict] = products_data) -> None:
+    db.open()
+    with db.connection() as conn:
+        previous_version = migrate(conn)
+        if previous_version == LATEST_VERSION:
+            catalog.reload(conn)
+            return
+
+        if conn.execute("SELECT 1 FROM sections LIMIT 1").fetchone() is None:
+            seed_catalog(conn, seed_items)
+
+        snapshot = catalog.reload(conn)
+        if not index_is_current(conn, snapshot):
+            rebuild_index(conn, snapshot)
+
+
+def seed_catalog(conn: sqlite3.Connection, items: list[dict]) -> None:
+    section_id = conn.execute("INSERT INTO sections(name) VALUES (?)", (DEFAULT_SECTION,)).lastrowid
+
+    grouped: dict[str, list[tuple[str, int]]] = {}
+    for item in items:
+        line_name, flavor_name = split_line_and_flavor(item["name"])
+        grouped.setdefault(line_name, []).append((flavor_name, round_to_5(int(item["price"]))))
+
+    rows = []
+    for line_name, flavors in grouped.items():
+        subsection_id = conn.execute(
+            "INSERT INTO subsections(section_id, name) VALUES (?, ?)",
+            (section_id, line_name),
+        ).lastrowid
+        rows.extend((subsection_id, flavor, price) for flavor, price in flavors)
+
+    conn.executemany("INSERT INTO products(subsection_id, name, price) VALUES (?, ?, ?)", rows)
+
+
+def reload_catalog(conn: sqlite3.Connection) -> None:
+    rebuild_index(conn, catalog.reload(conn))
+
+
+async def refresh_catalog() -> None:
+    await db.run(reload_catalog)
+    worker_link.emit(CATALOG_CHANGED)
+
+
+async def refresh_snapshot() -> None:
+    await db.run(catalog.reload)
+    worker_link.emit(CATALOG_CHANGED)
+
+
+async def sync_availability(levels: StockLevels) -> None:
+    products = catalog.snapshot.products
+    if any(
+        product_id in products and products[product_id].in_stock != (stock is None or stock > 0)
+        for product_id, stock in levels.items()
+    ):
+        await refresh_snapshot()
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id == settings.admin_id
+
+
+@lru_cache(maxsize=None)
+def main_menu() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="🛍 Каталог", callback_data=SectionsPage().pack())],
+            [InlineKeyboardButton(text="🧺 Корзина", callback_data=OPEN_CART)],
+            [InlineKeyboardButton(text="🔁 Повторить последний заказ", callback_data=REPEAT_ORDER)],
+            [InlineKeyboardButton(text="ℹ️ О магазине", callback_data=ABOUT)],
+        ]
+    )
+
+
+def sections_keyboard(page: int) -> InlineKeyboardMarkup:
+    snapshot = catalog.snapshot
+    return keyboard_pages.get_or_build(
+        ("sections", 0, page),
+        snapshot.version,
+        lambda: build_sections_keyboard(snapshot, page),
+    )
+
+
+def build_sections_keyboard(snapshot: CatalogSnapshot, page: int) -> InlineKeyboardMarkup:
+    sections = snapshot.ordered_sections
+
+    start = page * PAGE_SIZE
+    end = start + PAGE_SIZE
+    rows = [
+        [InlineKeyboardButton(text=section.name, callback_data=SectionPage(section_id=section.id).pack())]
+        for section in sections[start:end]
+    ]
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=SectionsPage(page=page - 1).pack()))
+    if end < len(sections):
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=SectionsPage(page=page + 1).pack()))
+    if nav:
+        rows.append(nav)
+
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=BACK_MAIN)])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def subsections_keyboard(section_id: int, page: int) -> InlineKeyboardMarkup:
+    snapshot = catalog.snapshot
+    return keyboard_pages.get_or_build(
+        ("section", section_id, page),
+        snapshot.version,
+        lambda: build_subsections_keyboard(snapshot, section_id, page),
+    )
+
+
+def build_subsections_keyboard(snapshot: CatalogSnapshot, section_id: int, page: int) -> InlineKeyboardMarkup:
+    subs = snapshot.section_children(section_id)
+
+    start = page * PAGE_SIZE
+    end = start + PAGE_SIZE
+    rows = [
+        [InlineKeyboardButton(text=sub.name[:55], callback_data=SubsectionPage(subsection_id=sub.id).pack())]
+        for sub in subs[start:end]
+    ]
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=SectionPage(section_id=section_id, page=page - 1).pack()))
+    if end < len(subs):
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=SectionPage(section_id=section_id, page=page + 1).pack()))
+    if nav:
+        rows.append(nav)
+
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=SectionsPage().pack())])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def products_keyboard(subsection_id: int, page: int) -> InlineKeyboardMarkup:
+    snapshot = catalog.snapshot
+    return keyboard_pages.get_or_build(
+        ("subsection", subsection_id, page),
+        snapshot.version,
+        lambda: build_products_keyboard(snapshot, subsection_id, page),
+    )
+
+
+def build_products_keyboard(snapshot: CatalogSnapshot, subsection_id: int, page: int) -> InlineKeyboardMarkup:
+    items = snapshot.subsection_children(subsection_id)
+    section_id = snapshot.subsections[subsection_id].section_id
+
+    start = page * PAGE_SIZE
+    end = start + PAGE_SIZE
+    rows = [
+        [
+            InlineKeyboardButton(
+                text=f"{item.name[:40]} — {item.price} ₽" if item.in_stock else f"{item.name[:40]} — нет в наличии",
+                callback_data=AddToCart(product_id=item.id).pack(),
+            )
+        ]
+        for item in items[start:end]
+    ]
+    if any(item.image for item in items[start:end]):
+        rows.append(
+            [InlineKeyboardButton(text="🖼 Фото", callback_data=SubsectionPhotos(subsection_id=subsection_id, page=page).pack())]
+        )
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=SubsectionPage(subsection_id=subsection_id, page=page - 1).pack()))
+    if end < len(items):
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=SubsectionPage(subsection_id=subsection_id, page=page + 1).pack()))
+    if nav:
+        rows.append(nav)
+
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=SectionPage(section_id=section_id).pack())])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def page_count(total: int) -> int:
+    return max(1, math.ceil(total / PAGE_SIZE))
+
+
+def find_product(product_id: int) -> Product | None:
+    return catalog.snapshot.products.get(product_id)
+
+
+def product_page(product: Product) -> int:
+    return catalog.snapshot.product_positions.get(product.id, 0) // PAGE_SIZE
+
+
+def cart_summary(cart: Dict[str, int]) -> CartSummary:
+    snapshot = catalog.snapshot
+    return cart_summaries.get_or_build(
+        tuple(cart.items()),
+        snapshot.version,
+        lambda: summarize_cart(snapshot, cart),
+    )
+
+
+async def on_start(message: Message, state: FSMContext) -> None:
+    cart_updates.discard(state.key)
+    await state.clear()
+    user_registry.register(message.from_user.id)
+    await message.answer("Привет! Это бот-магазин. Выберите действие:", reply_markup=main_menu())
+
+
+async def open_catalog(callback: CallbackQuery, callback_data: SectionsPage, state: FSMContext) -> None:
+    cart_updates.detach(state.key)
+    page = callback_data.page
+    total = len(catalog.snapshot.ordered_sections)
+    page_total = page_count(total)
+
+    await callback.message.edit_text(
+        f"Каталог (страница {page + 1}/{page_total}). Выберите раздел:",
+        reply_markup=sections_keyboard(page),
+    )
+    await callback.answer()
+
+
+async def open_section(callback: CallbackQuery, callback_data: SectionPage, state: FSMContext) -> None:
+    cart_updates.detach(state.key)
+    section_id = callback_data.section_id
+    page = callback_data.page
+
+    snapshot = catalog.snapshot
+    section = snapshot.sections.get(section_id)
+
+    if not section:
+        await callback.answer("Раздел не найден", show_alert=True)
+        return
+
+    total = len(snapshot.section_children(section_id))
+    page_total = page_count(total)
+    await callback.message.edit_text(
+        f"{section.name} (страница {page + 1}/{page_total}). Выберите подраздел:",
+        reply_markup=subsections_keyboard(section_id, page),
+    )
+    await callback.answer()
+
+
+async def open_subsection(callback: CallbackQuery, callback_data: SubsectionPage, state: FSMContext) -> None:
+    cart_updates.detach(state.key)
+    subsection_id = callback_data.subsection_id
+    page = callback_data.page
+
+    snapshot = catalog.snapshot
+    subsection = snapshot.subsections.get(subsection_id)
+
+    if not subsection:
+        await callback.answer("Подраздел не найден", show_alert=True)
+        return
+
+    total = len(snapshot.subsection_children(subsection_id))
+    page_total = page_count(total)
+    await callback.message.edit_text(
+        f"{subsection.name}\nВкусы (страница {page + 1}/{page_total}):",
+        reply_markup=products_keyboard(subsection_id, page),
+    )
+    await callback.answer()
+
+
+def product_caption(product: Product) -> str:
+    caption = f"{product.name} — {product.price} ₽"
+    return caption if product.in_stock else f"{caption} (нет в наличии)"
+
+
+async def subsection_photos(callback: CallbackQuery, callback_data: SubsectionPhotos) -> None:
+    start = callback_data.page * PAGE_SIZE
+    children = catalog.snapshot.subsection_children(callback_data.subsection_id)
+    items = [product for product in children[start : start + PAGE_SIZE] if product.image]
+    if not items:
+        await callback.answer("Для этих товаров пока нет фото", show_alert=True)
+        return
+
+    await callback.answer()
+    media = [photo_cache.media(product) for product in items]
+    if len(items) == 1:
+        sent = [await callback.message.answer_photo(media[0], caption=product_caption(items[0]))]
+    else:
+        sent = await callback.message.answer_media_group(
+            [InputMediaPhoto(media=item, caption=product_caption(product)) for item, product in zip(media, items)]
+        )
+    for product, message in zip(items, sent):
+        await photo_cache.remember(product, message)
+
+
+async def add_to_cart(callback: CallbackQuery, callback_data: AddToCart, state: FSMContext) -> None:
+    product_id = callback_data.product_id
+    product = find_product(product_id)
+    if not product:
+        await callback.answer("Товар не найден", show_alert=True)
+        return
+    if not product.in_stock:
+        await callback.answer("Этого товара сейчас нет в наличии", show_alert=True)
+        return
+
+    quantity = await cart_updates.change(state, product_id, 1)
+    await callback.answer(f"Добавлено в корзину ×{quantity} ✅")
+
+
+def product_button(product: Product) -> InlineKeyboardButton:
+    return InlineKeyboardButton(
+        text=f"{product.name[:40]} — {product.price} ₽",
+        callback_data=SubsectionPage(subsection_id=product.subsection_id, page=product_page(product)).pack(),
+    )
+
+
+async def search_page_view(query: str, page: int) -> tuple[str, InlineKeyboardMarkup]:
+    product_ids, total = await db.run(search_products, query, PAGE_SIZE, page * PAGE_SIZE)
+    snapshot = catalog.snapshot
+    found = [snapshot.products[pid] for pid in product_ids if pid in snapshot.products]
+
+    rows = [[product_button(product)] for product in found]
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=SearchPage(page=page - 1).pack()))
+    if (page + 1) * PAGE_SIZE < total:
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=SearchPage(page=page + 1).pack()))
+    if nav:
+        rows.append(nav)
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=BACK_MAIN)])
+
+    if not total:
+        text = f"По запросу «{query}» ничего не найдено."
+    else:
+        text = f"Поиск «{query}»: найдено {total} (страница {page + 1}/{page_count(total)})"
+    return text, InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def search_cmd(message: Message, state: FSMContext) -> None:
+    query = message.text.replace("/search", "", 1).strip()
+    if len(query) < MIN_SEARCH_QUERY:
+        await message.answer(f"Формат: /search <запрос> (не короче {MIN_SEARCH_QUERY} символов)")
+        return
+
+    await state.update_data(search_query=query)
+    text, markup = await search_page_view(query, 0)
+    await message.answer(text, reply_markup=markup)
+
+
+async def search_page(callback: CallbackQuery, callback_data: SearchPage, state: FSMContext) -> None:
+    page = callback_data.page
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("Повторите поиск: /search <запрос>", show_alert=True)
+        return
+
+    text, markup = await search_page_view(query, page)
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+
+async def inline_search(inline_query: InlineQuery) -> None:
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset or 0)
+    if len(query) < MIN_SEARCH_QUERY:
+        await inline_query.answer([], cache_time=5)
+        return
+
+    product_ids, total = await db.run(search_products, query, INLINE_PAGE_SIZE, offset)
+    snapshot = catalog.snapshot
+    results = []
+    for pid in product_ids:
+        product = snapshot.products.get(pid)
+        if product is None:
+            continue
+        line = snapshot.subsections[product.subsection_id].name
+        results.append(
+            InlineQueryResultArticle(
+                id=str(product.id),
+                title=f"{line} {product.name}",
+                description=f"{product.price} ₽",
+                input_message_content=InputTextMessageContent(
+                    message_text=f"{line} {product.name} — {product.price} ₽"
+                ),
+            )
+        )
+
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < total else ""
+    await inline_query.answer(results, cache_time=30, next_offset=next_offset)
+
+
+async def open_cart(callback: CallbackQuery, state: FSMContext) -> None:
+    await cart_updates.flush(state.key)
+    data = await state.get_data()
+    summary = cart_summary(data.get("cart", {}))
+    await callback.message.edit_text(summary.text, reply_markup=cart_keyboard(summary))
+    await callback.answer()
+
+
+def cart_keyboard(summary: CartSummary) -> InlineKeyboardMarkup:
+    return cart_keyboards.get_or_build(
+        summary.lines,
+        catalog.version,
+        lambda: build_cart_keyboard(summary),
+    )
+
+
+def build_cart_keyboard(summary: CartSummary) -> InlineKeyboardMarkup:
+    rows = [
+        [
+            InlineKeyboardButton(text="➖", callback_data=CartEdit(product_id=line.product_id, delta=-1).pack()),
+            InlineKeyboardButton(text=f"{line.name[:24]} ×{line.quantity}", callback_data=NOOP),
+            InlineKeyboardButton(text="➕", callback_data=CartEdit(product_id=line.product_id, delta=1).pack()),
+            InlineKeyboardButton(text="✖️", callback_data=CartRemove(product_id=line.product_id).pack()),
+        ]
+        for line in summary.lines
+    ]
+    if not summary.is_empty:
+        rows.append([InlineKeyboardButton(text="✅ Оформить заказ", callback_data=CHECKOUT)])
+        rows.append([InlineKeyboardButton(text="🗑 Очистить корзину", callback_data=CLEAR_CART)])
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=BACK_MAIN)])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def show_cart(message: Message, cart: dict[str, int]) -> None:
+    summary = cart_summary(cart)
+    await message.edit_text(summary.text, reply_markup=cart_keyboard(summary))
+
+
+async def edit_cart(callback: CallbackQuery, callback_data: CartEdit | CartRemove, state: FSMContext) -> None:
+    delta = callback_data.delta if isinstance(callback_data, CartEdit) else None
+    product = find_product(callback_data.product_id)
+    if delta is not None and delta > 0 and product is not None and not product.in_stock:
+        await callback.answer("Этого товара сейчас нет в наличии", show_alert=True)
+        return
+
+    message = callback.message
+    quantity = await cart_updates.change(
+        state,
+        callback_data.product_id,
+        delta,
+        lambda cart: show_cart(message, cart),
+    )
+    await callback.answer(f"В корзине ×{quantity}" if quantity else "Удалено из корзины")
+
+
+async def noop(callback: CallbackQuery) -> None:
+    await callback.answer()
+
+
+async def repeat_order(callback: CallbackQuery, state: FSMContext) -> None:
+    items = await db.run(last_order_items, callback.from_user.id)
+    if not items:
+        await callback.answer("У вас пока нет заказов", show_alert=True)
+        return
+
+    products = catalog.snapshot.products
+    cart = {str(pid): quantity for pid, quantity in items if pid in products and products[pid].in_stock}
+    if not cart:
+        await callback.answer("Товаров из последнего заказа сейчас нет в наличии", show_alert=True)
+        return
+
+    cart_updates.discard(state.key)
+    await state.update_data(cart=cart)
+    await show_cart(callback.message, cart)
+    if len(cart) < len(items):
+        await callback.answer("Часть товаров из последнего заказа сейчас недоступна", show_alert=True)
+    else:
+        await callback.answer("Корзина собрана по последнему заказу ✅")
+
+
+async def clear_cart(callback: CallbackQuery, state: FSMContext) -> None:
+    cart_updates.discard(state.key)
+    await state.update_data(cart={})
+    await callback.message.edit_text("Корзина очищена.", reply_markup=main_menu())
+    await callback.answer()
+
+
+async def about(callback: CallbackQuery, state: FSMContext) -> None:
+    cart_updates.detach(state.key)
+    await callback.message.edit_text(
+        "Мы предлагаем большой выбор качественных жидкостей и аксессуаров для вейпа.\n"
+        "Только проверенные бренды, актуальные вкусы и быстрая доставка.\n"
+        "Постоянные акции и скидки для наших клиентов.",
+        reply_markup=main_menu(),
+    )
+    await callback.answer()
+
+
+async def back_main(callback: CallbackQuery, state: FSMContext) -> None:
+    cart_updates.detach(state.key)
+    await callback.message.edit_text("Главное меню:", reply_markup=main_menu())
+    await callback.answer()
+
+
+async def stale_callback(callback: CallbackQuery) -> None:
+    await callback.answer("Это меню устарело, откройте новое: /start", show_alert=True)
+
+
+async def checkout_start(callback: CallbackQuery, state: FSMContext) -> None:
+    await cart_updates.flush(state.key)
+    data = await state.get_data()
+    summary = cart_summary(data.get("cart", {}))
+    if summary.is_empty:
+        await callback.answer("Корзина пуста", show_alert=True)
+        return
+
+    try:
+        levels = await db.run(reserve_stock, callback.from_user.id, summary.lines, settings.stock_reservation_ttl)
+    except OutOfStockError as exc:
+        await callback.answer(f"Недостаточно на складе: {out_of_stock_names(exc)}", show_alert=True)
+        return
+    await sync_availability(levels)
+
+    reserved = f"Товары зарезервированы на {math.ceil(settings.stock_reservation_ttl / 60)} мин.\n"
+    profile = await db.run(load_profile, callback.from_user.id)
+    if profile is None:
+        await state.set_state(Checkout.waiting_name)
+        await callback.message.answer(reserved + "Введите ваше имя для заказа:")
+    else:
+        await state.update_data(
+            customer_name=profile.name,
+            customer_phone=profile.phone,
+            saved_addresses=list(profile.addresses),
+        )
+        await state.set_state(Checkout.choosing_details)
+        await callback.message.answer(
+            reserved + f"Оформить на {profile.name}, {profile.phone}? Выберите адрес доставки:",
+            reply_markup=saved_details_keyboard(profile),
+        )
+    await callback.answer()
+
+
+def saved_details_keyboard(profile: CustomerProfile) -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text=f"📦 {address[:40]}", callback_data=SavedCheckout(address=index).pack())]
+        for index, address in enumerate(profile.addresses)
+    ]
+    rows.append([InlineKeyboardButton(text="🏠 Другой адрес", callback_data=NEW_ADDRESS)])
+    rows.append([InlineKeyboardButton(text="✏️ Другие имя и телефон", callback_data=CHECKOUT_MANUAL)])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def saved_checkout(callback: CallbackQuery, callback_data: SavedCheckout, state: FSMContext) -> None:
+    addresses = (await state.get_data()).get("saved_addresses", [])
+    if callback_data.address >= len(addresses):
+        await callback.answer("Это меню устарело, откройте корзину заново", show_alert=True)
+        return
+    await callback.answer()
+    await finish_order(callback.message, callback.from_user.id, state, addresses[callback_data.address])
+
+
+async def checkout_new_address(callback: CallbackQuery, state: FSMContext) -> None:
+    await state.set_state(Checkout.waiting_address)
+    await callback.message.answer("Введите адрес доставки (или самовывоза):")
+    await callback.answer()
+
+
+async def checkout_manual(callback: CallbackQuery, state: FSMContext) -> None:
+    await state.set_state(Checkout.waiting_name)
+    await callback.message.answer("Введите ваше имя для заказа:")
+    await callback.answer()
+
+
+def out_of_stock_names(exc: OutOfStockError) -> str:
+    products = catalog.snapshot.products
+    return ", ".join(products[pid].name if pid in products else f"#{pid}" for pid in exc.product_ids)
+
+
+async def checkout_name(message: Message, state: FSMContext) -> None:
+    await state.update_data(customer_name=message.text)
+    await state.set_state(Checkout.waiting_phone)
+    await message.answer("Введите телефон для связи:")
+
+
+async def checkout_phone(message: Message, state: FSMContext) -> None:
+    await state.update_data(customer_phone=message.text)
+    await state.set_state(Checkout.waiting_address)
+    await message.answer("Введите адрес доставки (или самовывоза):")
+
+
+async def checkout_address(message: Message, state: FSMContext) -> None:
+    await finish_order(message, message.from_user.id, state, message.text)
+
+
+async def checkout_not_text(message: Message) -> None:
+    await message.answer("Пожалуйста, отправьте ответ текстовым сообщением.")
+
+
+async def finish_order(message: Message, user_id: int, state: FSMContext, address: str) -> None:
+    data = await state.get_data()
+    summary = cart_summary(data.get("cart", {}))
+    if summary.is_empty:
+        cart_updates.discard(state.key)
+        await state.clear()
+        await message.answer("Корзина пуста — товары из неё больше не продаются.", reply_markup=main_menu())
+        return
+
+    try:
+        order, levels = await db.run(
+            place_order,
+            user_id,
+            data.get("customer_name"),
+            data.get("customer_phone"),
+            address,
+            summary,
+        )
+    except OutOfStockError as exc:
+        await state.set_state(None)
+        await message.answer(
+            f"Пока оформлялся заказ, закончились: {out_of_stock_names(exc)}. Измените корзину и оформите заказ снова.",
+            reply_markup=cart_keyboard(summary),
+        )
+        return
+    if is_primary:
+        order_notifier.submit(order)
+    else:
+        worker_link.hand_off(NOTIFY_ORDER, order_id=order.id)
+    await sync_availability(levels)
+
+    cart_updates.discard(state.key)
+    await state.clear()
+    await message.answer(f"Спасибо! Заказ №{order.id} принят и передан администратору ✅")
+    await message.answer("Главное меню:", reply_markup=main_menu())
+
+
+async def my_orders_cmd(message: Message) -> None:
+    rows = await db.run(recent_orders, message.from_user.id)
+    if not rows:
+        await message.answer("У вас пока нет заказов.")
+        return
+
+    lines = ["Ваши последние заказы:"]
+    lines.extend(f"№{row['id']} от {row['created_at']} — {row['total']} ₽" for row in rows)
+    await message.answer("\n".join(lines))
+
+
+ADMIN_HELP = (
+    "Команды администратора:\n"
+    "/add_section <название>\n"
+    "/del_section <section_id>\n"
+    "/add_subsection <section_id> | <название>\n"
+    "/del_subsection <subsection_id>\n"
+    "/add_product <subsection_id> | <название> | <цена>\n"
+    "/del_product <product_id>\n"
+    "/stock <product_id> <количество | ->\n"
+    "/photo <product_id> (подпись к фото) или /photo <product_id> <ссылка | ->\n"
+    "/import (подпись к CSV/JSON-файлу)\n"
+    "/export\n"
+    "/sync_prices\n"
+    "/users_count\n"
+    "/broadcast <текст>\n"
+    "/broadcast_status\n"
+    "/stats"
+)
+
+
+async def admin_help(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    await message.answer(ADMIN_HELP)
+
+
+async def add_section_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    name = message.text.replace("/add_section", "", 1).strip()
+    if not name:
+        await message.answer("Формат: /add_section <название>")
+        return
+    try:
+        await db.execute("INSERT INTO sections(name) VALUES (?)", (name,))
+    except sqlite3.IntegrityError:
+        await message.answer("Такой раздел уже есть")
+        return
+    await refresh_catalog()
+    await message.answer("Раздел добавлен ✅")
+
+
+async def del_section_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    try:
+        section_id = int(message.text.replace("/del_section", "", 1).strip())
+    except ValueError:
+        await message.answer("Формат: /del_section <section_id>")
+        return
+    await db.execute("DELETE FROM sections WHERE id = ?", (section_id,))
+    await refresh_catalog()
+    await message.answer("Раздел удалён ✅")
+
+
+async def add_subsection_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    payload = message.text.replace("/add_subsection", "", 1).strip()
+    if "|" not in payload:
+        await message.answer("Формат: /add_subsection <section_id> | <название>")
+        return
+    section_raw, name = [part.strip() for part in payload.split("|", maxsplit=1)]
+    try:
+        section_id = int(section_raw)
+    except ValueError:
+        await message.answer("section_id должен быть числом")
+        return
+    try:
+        await db.execute("INSERT INTO subsections(section_id, name) VALUES (?, ?)", (section_id, name))
+    except sqlite3.IntegrityError:
+        await message.answer("Раздел не найден")
+        return
+    await refresh_catalog()
+    await message.answer("Подраздел добавлен ✅")
+
+
+async def del_subsection_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    try:
+        subsection_id = int(message.text.replace("/del_subsection", "", 1).strip())
+    except ValueError:
+        await message.answer("Формат: /del_subsection <subsection_id>")
+        return
+    await db.execute("DELETE FROM subsections WHERE id = ?", (subsection_id,))
+    await refresh_catalog()
+    await message.answer("Подраздел удалён ✅")
+
+
+async def add_product_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    payload = message.text.replace("/add_product", "", 1).strip()
+    parts = [part.strip() for part in payload.split("|", maxsplit=2)]
+    if len(parts) != 3:
+        await message.answer("Формат: /add_product <subsection_id> | <название> | <цена>")
+        return
+    subsection_raw, name, price_raw = parts
+    try:
+        subsection_id = int(subsection_raw)
+        price = round_to_5(int(price_raw))
+    except ValueError:
+        await message.answer("subsection_id и цена должны быть числами")
+        return
+    try:
+        await db.execute(
+            "INSERT INTO products(subsection_id, name, price) VALUES (?, ?, ?)",
+            (subsection_id, name, price),
+        )
+    except sqlite3.IntegrityError:
+        await message.answer("Подраздел не найден")
+        return
+    await refresh_catalog()
+    await message.answer("Товар добавлен ✅")
+
+
+async def del_product_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    try:
+        product_id = int(message.text.replace("/del_product", "", 1).strip())
+    except ValueError:
+        await message.answer("Формат: /del_product <product_id>")
+        return
+    await db.execute("DELETE FROM products WHERE id = ?", (product_id,))
+    await refresh_catalog()
+    await message.answer("Товар удалён ✅")
+
+
+async def stock_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    parts = message.text.replace("/stock", "", 1).split()
+    try:
+        product_id = int(parts[0])
+        stock = None if parts[1] == "-" else int(parts[1])
+        if len(parts) != 2 or (stock is not None and stock < 0):
+            raise ValueError
+    except (IndexError, ValueError):
+        await message.answer("Формат: /stock <product_id> <количество> (или «-», чтобы не учитывать остаток)")
+        return
+    if not await db.execute("UPDATE products SET stock = ? WHERE id = ?", (stock, product_id)):
+        await message.answer("Товар не найден")
+        return
+    await refresh_snapshot()
+    await message.answer("Остаток не учитывается ✅" if stock is None else f"Остаток: {stock} шт. ✅")
+
+
+async def photo_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    parts = (message.text or message.caption or "").replace("/photo", "", 1).split(maxsplit=1)
+    try:
+        product_id = int(parts[0])
+        if not message.photo and len(parts) != 2:
+            raise ValueError
+    except (IndexError, ValueError):
+        await message.answer("Формат: /photo <product_id> (подпись к фото) или /photo <product_id> <ссылка | ->")
+        return
+    product = find_product(product_id)
+    if product is None:
+        await message.answer("Товар не найден")
+        return
+
+    if message.photo:
+        image = file_id = message.photo[-1].file_id
+    elif parts[1] == "-":
+        image = file_id = None
+    else:
+        image = parts[1]
+        try:
+            sent = await message.answer_photo(image_input(image), caption=product_caption(product))
+        except (TelegramAPIError, aiohttp.ClientError) as exc:
+            await message.answer(f"Не удалось загрузить фото: {exc}")
+            return
+        file_id = sent_file_id(sent)
+
+    await db.execute("UPDATE products SET image = ?, image_file_id = ? WHERE id = ?", (image, file_id, product.id))
+    await refresh_snapshot()
+    await message.answer("Фото удалено ✅" if image is None else "Фото сохранено ✅")
+
+
+async def import_cmd(message: Message, bot: Bot) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    if message.document is None:
+        await message.answer("Отправьте CSV или JSON файл с подписью /import")
+        return
+
+    content = await bot.download(message.document, destination=io.BytesIO())
+    try:
+        report = await db.run(import_document, message.document.file_name or "", content.getvalue())
+    except CatalogImportError as exc:
+        await message.answer(f"Импорт не выполнен: {exc}")
+        return
+    if report.changed:
+        await refresh_catalog()
+    await message.answer(report.text)
+
+
+def export_document(conn: sqlite3.Connection) -> tuple[bytes, int]:
+    with io.StringIO() as stream:
+        count = export_catalog(conn, stream)
+        return stream.getvalue().encode("utf-8-sig"), count
+
+
+async def export_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    content, count = await db.run(export_document)
+    await message.answer_document(
+        BufferedInputFile(content, filename="catalog.csv"),
+        caption=f"Товаров в каталоге: {count}",
+    )
+
+
+async def sync_prices_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    if not price_sync.enabled:
+        await message.answer("Синхронизация прайса выключена: CATALOG_URL не задан.")
+        return
+    background_error = price_sync.last_error
+    try:
+        report = await price_sync.sync()
+    except (aiohttp.ClientError, asyncio.TimeoutError, CatalogImportError, csv.Error, sqlite3.Error) as exc:
+        await message.answer(f"Не удалось обновить прайс: {exc}")
+        return
+    if report is not None:
+        await message.answer(report.text)
+        return
+    lines = ["Прайс не изменился."]
+    if price_sync.last_report is not None:
+        lines.append(f"Последнее обновление: {price_sync.last_report.text}")
+    if background_error:
+        lines.append(f"Ошибка фоновой синхронизации: {background_error}")
+    await message.answer("\n".join(lines))
+
+
+async def users_count_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    count = (await db.fetchone("SELECT value FROM counters WHERE name = 'users'"))[0]
+    await message.answer(f"Пользователей, использовавших бота: {count}")
+
+
+async def broadcast_cmd(message: Message, bot: Bot) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    text = message.text.replace("/broadcast", "", 1).strip()
+    if not text:
+        await message.answer("Формат: /broadcast <текст>")
+        return
+
+    if is_primary:
+        job = await broadcaster.start(bot, text, message.chat.id)
+    else:
+        job = await broadcaster.create(text)
+        worker_link.hand_off(RUN_BROADCAST, job_id=job.id, chat_id=message.chat.id)
+    await message.answer(f"Рассылка #{job.id} запущена. Прогресс: /broadcast_status")
+
+
+async def broadcast_status_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+
+    jobs = await broadcaster.recent_jobs()
+    if not jobs:
+        await message.answer("Рассылок ещё не было.")
+        return
+
+    lines = ["Рассылки:"]
+    for job in jobs:
+        if job.error is not None:
+            status = f"остановлена из-за ошибки ({job.error}), продолжится после перезапуска"
+        else:
+            status = "идёт" if job.status == "running" else "завершена"
+        lines.append(
+            f"#{job.id} — {status}: отправлено {job.sent}, ошибок {job.failed}, "
+            f"{job.throughput:.1f} сообщ./с"
+        )
+    await message.answer("\n".join(lines))
+
+
+async def stats_cmd(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    if not metrics.enabled:
+        await message.answer("Сбор метрик выключен (METRICS_ENABLED=0).")
+        return
+    await message.answer(metrics.summary())
+
+
+async def on_startup(bot: Bot) -> None:
+    for middleware in (outgoing, polling_backpressure):
+        if middleware not in bot.session.middleware:
+            bot.session.middleware(middleware)
+    await user_registry.load()
+    if is_primary:
+        recover = not settings.worker_restarts
+        await order_notifier.start(bot, recover=recover)
+        if recover:
+            await broadcaster.resume(bot, settings.admin_id)
+        await price_sync.start()
+        await reservation_sweeper.start()
+
+
+async def on_shutdown(dispatcher: Dispatcher) -> None:
+    await price_sync.stop()
+    await reservation_sweeper.stop()
+    await broadcaster.stop()
+    await order_notifier.stop()
+    await user_registry.close()
+    await cart_updates.close()
+    await dispatcher.storage.close()
+
+
+def build_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=create_storage(settings, db), events_isolation=event_isolation)
+    dp.update.outer_middleware(update_limiter)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
+    timing = HandlerTimingMiddleware(metrics)
+    dp.message.middleware(timing)
+    dp.callback_query.middleware(timing)
+    dp.inline_query.middleware(timing)
+
+    dp.message.register(on_start, CommandStart())
+    dp.message.register(my_orders_cmd, Command("orders"))
+    dp.message.register(search_cmd, Command("search"))
+    dp.message.register(admin_help, Command("admin"))
+    dp.message.register(add_section_cmd, Command("add_section"))
+    dp.message.register(del_section_cmd, Command("del_section"))
+    dp.message.register(add_subsection_cmd, Command("add_subsection"))
+    dp.message.register(del_subsection_cmd, Command("del_subsection"))
+    dp.message.register(add_product_cmd, Command("add_product"))
+    dp.message.register(del_product_cmd, Command("del_product"))
+    dp.message.register(stock_cmd, Command("stock"))
+    dp.message.register(photo_cmd, Command("photo"))
+    dp.message.register(import_cmd, Command("import"))
+    dp.message.register(export_cmd, Command("export"))
+    dp.message.register(sync_prices_cmd, Command("sync_prices"))
+    dp.message.register(users_count_cmd, Command("users_count"))
+    dp.message.register(broadcast_cmd, Command("broadcast"))
+    dp.message.register(broadcast_status_cmd, Command("broadcast_status"))
+    dp.message.register(stats_cmd, Command("stats"))
+
+    dp.callback_query.register(add_to_cart, AddToCart.filter())
+    dp.callback_query.register(edit_cart, CartEdit.filter())
+    dp.callback_query.register(edit_cart, CartRemove.filter())
+    dp.callback_query.register(open_subsection, SubsectionPage.filter())
+    dp.callback_query.register(subsection_photos, SubsectionPhotos.filter())
+    dp.callback_query.register(open_section, SectionPage.filter())
+    dp.callback_query.register(open_catalog, SectionsPage.filter())
+    dp.callback_query.register(search_page, SearchPage.filter())
+    dp.callback_query.register(open_cart, F.data == OPEN_CART)
+    dp.callback_query.register(about, F.data == ABOUT)
+    dp.callback_query.register(back_main, F.data == BACK_MAIN)
+    dp.callback_query.register(clear_cart, F.data == CLEAR_CART)
+    dp.callback_query.register(checkout_start, F.data == CHECKOUT)
+    dp.callback_query.register(repeat_order, F.data == REPEAT_ORDER)
+    dp.callback_query.register(saved_checkout, SavedCheckout.filter(), Checkout.choosing_details)
+    dp.callback_query.register(checkout_new_address, F.data == NEW_ADDRESS, Checkout.choosing_details)
+    dp.callback_query.register(checkout_manual, F.data == CHECKOUT_MANUAL, Checkout.choosing_details)
+    dp.callback_query.register(noop, F.data == NOOP)
+    dp.callback_query.register(stale_callback)
+    dp.inline_query.register(inline_search)
+
+    dp.message.register(checkout_name, Checkout.waiting_name, F.text)
+    dp.message.register(checkout_phone, Checkout.waiting_phone, F.text)
+    dp.message.register(checkout_address, Checkout.waiting_address, F.text)
+    dp.message.register(
+        checkout_not_text,
+        StateFilter(Checkout.waiting_name, Checkout.waiting_phone, Checkout.waiting_address),
+    )
+    return dp
+
+
+async def main() -> None:
+    init_db()
+    if settings.bot_workers > 1 and not worker_link.active:
+        allowed_updates = build_dispatcher().resolve_used_update_types()
+        db.close()
+        await run_supervisor(settings, allowed_updates)
+        return
+
+    bot = Bot(settings.bot_token)
+    dp = build_dispatcher()
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(metrics, settings.metrics_host, settings.metrics_port)
+
+    try:
+        if settings.bot_mode == "webhook":
+            await run_webhook(dp, bot, settings)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from db import Database
+from outgoing import own_flood_retries
+
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastJob:
+    id: int
+    text: str
+    last_user_id: int = 0
+    sent: int = 0
+    failed: int = 0
+    status: str = "running"
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+    session_sent: int = 0
+    error: str | None = None
+
+    @property
+    def throughput(self) -> float:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.session_sent / elapsed if elapsed > 0 else 0.0
+
+
+class Broadcaster:
+    def __init__(self, db: Database, rate: float = 25, concurrency: int = 8, chunk_size: int = 500) -> None:
+        self.db = db
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.jobs: dict[int, BroadcastJob] = {}
+        self.failed = 0
+        self.last_error: str | None = None
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+
+    async def create(self, text: str) -> BroadcastJob:
+        job_id = await self.db.run(_create_job, text)
+        return BroadcastJob(id=job_id, text=text)
+
+    async def start(self, bot: Bot, text: str, notify_chat_id: int) -> BroadcastJob:
+        job = await self.create(text)
+        self._spawn(bot, job, notify_chat_id)
+        return job
+
+    async def run_job(self, bot: Bot, job_id: int, notify_chat_id: int) -> None:
+        job = await self.db.run(_load_job, job_id)
+        if job is not None and job.status == "running" and job.id not in self._tasks:
+            self._spawn(bot, job, notify_chat_id)
+
+    async def resume(self, bot: Bot, notify_chat_id: int) -> None:
+        for job in await self.db.run(_load_running_jobs):
+            if job.id not in self._tasks:
+                self._spawn(bot, job, notify_chat_id)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def recent_jobs(self, limit: int = 5) -> list[BroadcastJob]:
+        stored = await self.db.run(_load_recent_jobs, limit)
+        return [self.jobs.get(job.id, job) for job in stored]
+
+    def _spawn(self, bot: Bot, job: BroadcastJob, notify_chat_id: int) -> None:
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self._guarded_run(bot, job, notify_chat_id))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def _guarded_run(self, bot: Bot, job: BroadcastJob, notify_chat_id: int) -> None:
+        job.error = None
+        try:
+            await self._run(bot, job, notify_chat_id)
+        except Exception as exc:
+            job.error = self.last_error = str(exc) or type(exc).__name__
+            self.failed += 1
+            logger.exception("Broadcast %s stopped after %s messages", job.id, job.sent)
+
+    async def _run(self, bot: Bot, job: BroadcastJob, notify_chat_id: int) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(user_id: int) -> bool:
+            async with semaphore:
+                return await self._send(bot, user_id, job.text)
+
+        while True:
+            user_ids = await self.db.run(_next_user_chunk, job.last_user_id, self.chunk_size)
+            if not user_ids:
+                break
+            results = await asyncio.gather(*(deliver(user_id) for user_id in user_ids))
+            delivered = sum(results)
+            job.sent += delivered
+            job.session_sent += delivered
+            job.failed += len(results) - delivered
+            job.last_user_id = user_ids[-1]
+            await self.db.run(_save_progress, job)
+
+        job.status = "done"
+        job.finished_at = time.monotonic()
+        await self.db.run(_save_progress, job)
+        try:
+            await bot.send_message(
+                notify_chat_id,
+                f"Рассылка #{job.id} завершена. Отправлено: {job.sent}, ошибок: {job.failed}",
+            )
+        except TelegramAPIError:
+            pass
+
+    async def _send(self, bot: Bot, user_id: int, text: str) -> bool:
+        for _ in range(MAX_RETRIES):
+            await self.bucket.acquire()
+            try:
+                with own_flood_retries():
+                    await bot.send_message(user_id, text)
+                return True
+            except TelegramRetryAfter as exc:
+                self.bucket.pause(exc.retry_after)
+            except TelegramAPIError:
+                return False
+        return False
+
+
+def _create_job(conn: sqlite3.Connection, text: str) -> int:
+    return conn.execute("INSERT INTO broadcasts(text) VALUES (?)", (text,)).lastrowid
+
+
+def _row_to_job(row: sqlite3.Row) -> BroadcastJob:
+    return BroadcastJob(
+        id=row["id"],
+        text=row["text"],
+        last_user_id=row["last_user_id"],
+        sent=row["sent"],
+        failed=row["failed"],
+        status=row["status"],
+    )
+
+
+def _load_job(conn: sqlite3.Connection, job_id: int) -> BroadcastJob | None:
+    row = conn.execute("SELECT * FROM broadcasts WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row is not None else None
+
+
+def _load_running_jobs(conn: sqlite3.Connection) -> list[BroadcastJob]:
+    rows = conn.execute("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id").fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def _load_recent_jobs(conn: sqlite3.Connection, limit: int) -> list[BroadcastJob]:
+    rows = conn.execute("SELECT * FROM broadcasts ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def _next_user_chunk(conn: sqlite3.Connection, after_user_id: int, limit: int) -> list[int]:
+    rows = conn.execute(
+        "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+        (after_user_id, limit),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _save_progress(conn: sqlite3.Connection, job: BroadcastJob) -> None:
+    conn.execute(
+        """
+        UPDATE broadcasts
+        SET last_user_id = ?, sent = ?, failed = ?, status = ?,
+            finished_at = CASE WHEN ? = 'done' THEN CURRENT_TIMESTAMP ELSE finished_at END
+        WHERE id = ?
+        """,
+        (job.last_user_id, job.sent, job.failed, job.status, job.status, job.id),
+    )
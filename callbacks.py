@@ -0,0 +1,56 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class MenuAction(CallbackData, prefix="m"):
+    action: str
+
+
+class SectionsPage(CallbackData, prefix="c"):
+    page: int = 0
+
+
+class SectionPage(CallbackData, prefix="s"):
+    section_id: int
+    page: int = 0
+
+
+class SubsectionPage(CallbackData, prefix="u"):
+    subsection_id: int
+    page: int = 0
+
+
+class SubsectionPhotos(CallbackData, prefix="f"):
+    subsection_id: int
+    page: int = 0
+
+
+class AddToCart(CallbackData, prefix="a"):
+    product_id: int
+
+
+class CartEdit(CallbackData, prefix="e"):
+    product_id: int
+    delta: int
+
+
+class CartRemove(CallbackData, prefix="r"):
+    product_id: int
+
+
+class SavedCheckout(CallbackData, prefix="o"):
+    address: int
+
+
+class SearchPage(CallbackData, prefix="q"):
+    page: int = 0
+
+
+OPEN_CART = MenuAction(action="cart").pack()
+ABOUT = MenuAction(action="about").pack()
+BACK_MAIN = MenuAction(action="main").pack()
+CLEAR_CART = MenuAction(action="clear").pack()
+CHECKOUT = MenuAction(action="checkout").pack()
+NOOP = MenuAction(action="noop").pack()
+REPEAT_ORDER = MenuAction(action="repeat").pack()
+NEW_ADDRESS = MenuAction(action="address").pack()
+CHECKOUT_MANUAL = MenuAction(action="manual").pack()
@@ -0,0 +1,146 @@
+import asyncio
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Awaitable, Callable, Mapping
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+from catalog import CatalogSnapshot
+
+
+@dataclass(frozen=True)
+class CartLine:
+    product_id: int
+    name: str
+    price: int
+    quantity: int
+
+    @property
+    def subtotal(self) -> int:
+        return self.price * self.quantity
+
+
+@dataclass(frozen=True)
+class CartSummary:
+    lines: tuple[CartLine, ...]
+    total: int
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.lines
+
+    @cached_property
+    def text(self) -> str:
+        if self.is_empty:
+            return "Ваша корзина пуста."
+
+        rows = ["🧺 Ваша корзина:"]
+        rows.extend(f"• {line.name} × {line.quantity} = {line.subtotal} ₽" for line in self.lines)
+        rows.append(f"\nИтого: {self.total} ₽")
+        return "\n".join(rows)
+
+
+def summarize_cart(snapshot: CatalogSnapshot, cart: Mapping[str, int]) -> CartSummary:
+    lines = []
+    for product_id, quantity in cart.items():
+        product = snapshot.products.get(int(product_id))
+        if product is None or quantity <= 0:
+            continue
+        lines.append(CartLine(product.id, product.name, product.price, quantity))
+    return CartSummary(lines=tuple(lines), total=sum(line.subtotal for line in lines))
+
+
+@dataclass
+class _PendingCart:
+    state: FSMContext
+    cart: dict[str, int]
+    after: Callable[[dict[str, int]], Awaitable[None]] | None = None
+    task: asyncio.Task[None] | None = field(default=None, repr=False)
+
+
+class CartUpdates:
+    def __init__(self, delay: float = 0.6, isolation: BaseEventIsolation | None = None) -> None:
+        self.delay = delay
+        self.isolation = isolation
+        self._pending: dict[StorageKey, _PendingCart] = {}
+        self._flushing: dict[StorageKey, _PendingCart] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def change(
+        self,
+        state: FSMContext,
+        product_id: int,
+        delta: int | None,
+        after: Callable[[dict[str, int]], Awaitable[None]] | None = None,
+    ) -> int:
+        pending = self._pending.get(state.key)
+        if pending is None:
+            cart = dict((await state.get_data()).get("cart", {}))
+            pending = self._pending.setdefault(state.key, _PendingCart(state, cart))
+            if pending.task is None:
+                pending.task = asyncio.create_task(self._delayed_flush(state.key))
+
+        key = str(product_id)
+        quantity = 0 if delta is None else max(0, pending.cart.get(key, 0) + delta)
+        if quantity:
+            pending.cart[key] = quantity
+        else:
+            pending.cart.pop(key, None)
+        pending.after = after
+        return quantity
+
+    async def _delayed_flush(self, key: StorageKey) -> None:
+        await asyncio.sleep(self.delay)
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.task = None
+        await asyncio.shield(self._isolated_flush(key))
+
+    async def _isolated_flush(self, key: StorageKey) -> None:
+        if self.isolation is None:
+            pending = await self._write(key)
+        else:
+            async with self.isolation.lock(key):
+                pending = await self._write(key)
+        if pending is not None and pending.after is not None:
+            await pending.after(pending.cart)
+
+    async def flush(self, key: StorageKey) -> None:
+        pending = await self._write(key)
+        if pending is not None and pending.after is not None:
+            await pending.after(pending.cart)
+
+    async def _write(self, key: StorageKey) -> _PendingCart | None:
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return None
+        if pending.task is not None:
+            pending.task.cancel()
+
+        self._flushing[key] = pending
+        try:
+            await pending.state.update_data(cart=pending.cart)
+        finally:
+            if self._flushing.get(key) is pending:
+                del self._flushing[key]
+        return pending
+
+    def detach(self, key: StorageKey) -> None:
+        for pending in (self._pending.get(key), self._flushing.get(key)):
+            if pending is not None:
+                pending.after = None
+
+    def discard(self, key: StorageKey) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is not None and pending.task is not None:
+            pending.task.cancel()
+
+    async def close(self) -> None:
+        for key in list(self._pending):
+            pending = self._pending[key]
+            pending.after = None
+            await self.flush(key)
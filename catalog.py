@@ -0,0 +1,172 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, TypeVar
+
+
+T = TypeVar("T")
+MARKER_TOKENS = {"HARD", "MEDIUM", "LIGHT", "V2"}
+
+
+def round_to_5(price: int) -> int:
+    return int(round(price / 5) * 5)
+
+
+def split_line_and_flavor(name: str) -> tuple[str, str]:
+    tokens = name.split()
+    marker_indexes = [idx for idx, token in enumerate(tokens) if token.upper() in MARKER_TOKENS]
+
+    if marker_indexes:
+        marker_index = marker_indexes[-1]
+        line = " ".join(tokens[: marker_index + 1]).strip()
+        flavor = " ".join(tokens[marker_index + 1 :]).strip()
+    else:
+        line = tokens[0].strip() if tokens else name.strip()
+        flavor = " ".join(tokens[1:]).strip()
+
+    return line or name.strip(), flavor or "Классический"
+
+
+@dataclass(frozen=True)
+class Section:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class Subsection:
+    id: int
+    section_id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class Product:
+    id: int
+    subsection_id: int
+    name: str
+    price: int
+    stock: int | None = None
+    image: str | None = None
+    image_file_id: str | None = None
+
+    @property
+    def in_stock(self) -> bool:
+        return self.stock is None or self.stock > 0
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int = 0
+    sections: dict[int, Section] = field(default_factory=dict)
+    subsections: dict[int, Subsection] = field(default_factory=dict)
+    products: dict[int, Product] = field(default_factory=dict)
+    ordered_sections: tuple[Section, ...] = ()
+    subsections_by_section: dict[int, tuple[Subsection, ...]] = field(default_factory=dict)
+    products_by_subsection: dict[int, tuple[Product, ...]] = field(default_factory=dict)
+    product_positions: dict[int, int] = field(default_factory=dict)
+
+    def section_children(self, section_id: int) -> tuple[Subsection, ...]:
+        return self.subsections_by_section.get(section_id, ())
+
+    def subsection_children(self, subsection_id: int) -> tuple[Product, ...]:
+        return self.products_by_subsection.get(subsection_id, ())
+
+
+def load_snapshot(conn: sqlite3.Connection, version: int) -> CatalogSnapshot:
+    sections = {
+        row["id"]: Section(row["id"], row["name"])
+        for row in conn.execute("SELECT id, name FROM sections ORDER BY id")
+    }
+    subsections = {
+        row["id"]: Subsection(row["id"], row["section_id"], row["name"])
+        for row in conn.execute("SELECT id, section_id, name FROM subsections ORDER BY id")
+    }
+    products = {
+        row["id"]: Product(
+            row["id"],
+            row["subsection_id"],
+            row["name"],
+            row["price"],
+            row["stock"],
+            row["image"],
+            row["image_file_id"],
+        )
+        for row in conn.execute(
+            "SELECT id, subsection_id, name, price, stock, image, image_file_id FROM products ORDER BY id"
+        )
+    }
+
+    subsections_by_section: dict[int, list[Subsection]] = {section_id: [] for section_id in sections}
+    for subsection in subsections.values():
+        subsections_by_section.setdefault(subsection.section_id, []).append(subsection)
+
+    products_by_subsection: dict[int, list[Product]] = {subsection_id: [] for subsection_id in subsections}
+    for product in products.values():
+        products_by_subsection.setdefault(product.subsection_id, []).append(product)
+
+    return CatalogSnapshot(
+        version=version,
+        sections=sections,
+        subsections=subsections,
+        products=products,
+        ordered_sections=tuple(sections.values()),
+        subsections_by_section={key: tuple(value) for key, value in subsections_by_section.items()},
+        products_by_subsection={key: tuple(value) for key, value in products_by_subsection.items()},
+        product_positions={
+            product.id: position
+            for children in products_by_subsection.values()
+            for position, product in enumerate(children)
+        },
+    )
+
+
+class Catalog:
+    def __init__(self) -> None:
+        self._snapshot = CatalogSnapshot()
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def reload(self, conn: sqlite3.Connection) -> CatalogSnapshot:
+        with self._lock:
+            snapshot = load_snapshot(conn, self._snapshot.version + 1)
+            self._snapshot = snapshot
+        return snapshot
+
+
+class PageCache:
+    def __init__(self, max_size: int = 512) -> None:
+        self.max_size = max_size
+        self._pages: OrderedDict[Hashable, Any] = OrderedDict()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def get_or_build(self, key: Hashable, version: int, build: Callable[[], T]) -> T:
+        if version != self._version:
+            self._pages.clear()
+            self._version = version
+
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+        self.misses += 1
+        page = build()
+        self._pages[key] = page
+        if len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+        return page
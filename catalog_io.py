@@ -0,0 +1,252 @@
+import csv
+import io
+import json
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator
+
+from catalog import round_to_5, split_line_and_flavor
+
+
+DEFAULT_SECTION = "Жидкости"
+EXPORT_HEADER = ("section", "subsection", "name", "price")
+COLUMN_ALIASES = {
+    "section": {"section", "раздел"},
+    "subsection": {"subsection", "line", "подраздел", "линейка"},
+    "name": {"name", "product", "flavor", "название", "наименование", "товар", "вкус"},
+    "price": {"price", "цена", "стоимость"},
+}
+
+
+class CatalogImportError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class CatalogRow:
+    section: str
+    subsection: str
+    name: str
+    price: int
+
+
+@dataclass
+class ImportReport:
+    sections: int = 0
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    @property
+    def text(self) -> str:
+        return (
+            f"Импорт завершён: разделов {self.sections}, добавлено {self.added}, "
+            f"обновлено {self.updated}, удалено {self.removed}, без изменений {self.unchanged}, "
+            f"пропущено строк {self.skipped}"
+        )
+
+
+def parse_price(raw: object) -> int | None:
+    if isinstance(raw, (int, float)):
+        return round_to_5(int(raw))
+    cleaned = str(raw).replace("\xa0", "").replace(" ", "").replace(",", ".")
+    match = re.search(r"\d+(?:\.\d+)?", cleaned)
+    if not match:
+        return None
+    return round_to_5(int(float(match.group(0))))
+
+
+def make_row(section: str, subsection: str, name: str, price: object) -> CatalogRow | None:
+    name = name.strip()
+    parsed_price = parse_price(price)
+    if not name or parsed_price is None:
+        return None
+    subsection = subsection.strip()
+    if not subsection:
+        subsection, name = split_line_and_flavor(name)
+    return CatalogRow(section.strip() or DEFAULT_SECTION, subsection, name, parsed_price)
+
+
+def _column_map(header: list[str]) -> dict[str, int]:
+    normalized = [cell.strip().lower() for cell in header]
+    columns = {}
+    for field_name, aliases in COLUMN_ALIASES.items():
+        index = next((i for i, cell in enumerate(normalized) if cell in aliases), None)
+        if index is not None:
+            columns[field_name] = index
+    if "name" not in columns or "price" not in columns:
+        raise CatalogImportError("В заголовке нужны как минимум колонки name и price")
+    return columns
+
+
+def iter_csv_rows(stream: IO[str], report: ImportReport) -> Iterator[CatalogRow]:
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect: type[csv.Dialect] | csv.Dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(stream, dialect)
+    header = next(reader, None)
+    if header is None:
+        raise CatalogImportError("Файл пустой")
+    columns = _column_map(header)
+
+    def cell(values: list[str], field_name: str) -> str:
+        index = columns.get(field_name)
+        return values[index] if index is not None and index < len(values) else ""
+
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        row = make_row(cell(values, "section"), cell(values, "subsection"), cell(values, "name"), cell(values, "price"))
+        if row is None:
+            report.skipped += 1
+            continue
+        yield row
+
+
+def iter_json_rows(content: bytes, report: ImportReport) -> Iterator[CatalogRow]:
+    try:
+        document = json.loads(content.decode("utf-8-sig"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise CatalogImportError(f"Некорректный JSON: {exc}") from exc
+    if isinstance(document, dict):
+        document = document.get("products", [])
+    if not isinstance(document, list):
+        raise CatalogImportError("JSON должен быть списком товаров или объектом с ключом products")
+
+    for item in document:
+        row = None
+        if isinstance(item, dict):
+            row = make_row(
+                str(item.get("section", "")),
+                str(item.get("subsection", "")),
+                str(item.get("name", "")),
+                item.get("price", ""),
+            )
+        if row is None:
+            report.skipped += 1
+            continue
+        yield row
+
+
+def iter_document_rows(filename: str, content: bytes, report: ImportReport) -> Iterator[CatalogRow]:
+    if filename.lower().endswith(".json"):
+        yield from iter_json_rows(content, report)
+        return
+    with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8-sig", newline="") as stream:
+        yield from iter_csv_rows(stream, report)
+
+
+def _placeholders(values: list) -> str:
+    return ",".join("?" * len(values))
+
+
+def apply_import(conn: sqlite3.Connection, rows: Iterable[CatalogRow], report: ImportReport) -> ImportReport:
+    desired: dict[str, dict[str, dict[str, int]]] = {}
+    for row in rows:
+        desired.setdefault(row.section, {}).setdefault(row.subsection, {})[row.name] = row.price
+    report.sections = len(desired)
+    if not desired:
+        return report
+
+    section_names = list(desired)
+    conn.executemany("INSERT OR IGNORE INTO sections(name) VALUES (?)", [(name,) for name in section_names])
+    section_ids = {
+        row["name"]: row["id"]
+        for row in conn.execute(
+            f"SELECT id, name FROM sections WHERE name IN ({_placeholders(section_names)})",
+            section_names,
+        )
+    }
+    ids = list(section_ids.values())
+
+    def load_subsections() -> dict[tuple[int, str], int]:
+        return {
+            (row["section_id"], row["name"]): row["id"]
+            for row in conn.execute(
+                f"SELECT id, section_id, name FROM subsections WHERE section_id IN ({_placeholders(ids)})",
+                ids,
+            )
+        }
+
+    current_subsections = load_subsections()
+    current_products = {
+        (row["subsection_id"], row["name"]): (row["id"], row["price"])
+        for row in conn.execute(
+            f"""
+            SELECT p.id, p.subsection_id, p.name, p.price
+            FROM products p JOIN subsections s ON s.id = p.subsection_id
+            WHERE s.section_id IN ({_placeholders(ids)})
+            """,
+            ids,
+        )
+    }
+
+    wanted_subsections = {
+        (section_ids[section], subsection) for section, subsections in desired.items() for subsection in subsections
+    }
+    conn.executemany(
+        "INSERT INTO subsections(section_id, name) VALUES (?, ?)",
+        sorted(wanted_subsections - current_subsections.keys()),
+    )
+    subsection_ids = load_subsections()
+
+    inserts, updates, seen = [], [], set()
+    for section, subsections in desired.items():
+        for subsection, products in subsections.items():
+            subsection_id = subsection_ids[(section_ids[section], subsection)]
+            for name, price in products.items():
+                key = (subsection_id, name)
+                seen.add(key)
+                existing = current_products.get(key)
+                if existing is None:
+                    inserts.append((subsection_id, name, price))
+                elif existing[1] != price:
+                    updates.append((price, existing[0]))
+                else:
+                    report.unchanged += 1
+    deletes = [(product_id,) for key, (product_id, _) in current_products.items() if key not in seen]
+    stale_subsections = [(subsection_ids[key],) for key in subsection_ids.keys() - wanted_subsections]
+
+    conn.executemany("INSERT INTO products(subsection_id, name, price) VALUES (?, ?, ?)", inserts)
+    conn.executemany("UPDATE products SET price = ? WHERE id = ?", updates)
+    conn.executemany("DELETE FROM products WHERE id = ?", deletes)
+    conn.executemany("DELETE FROM subsections WHERE id = ?", stale_subsections)
+    report.added += len(inserts)
+    report.updated += len(updates)
+    report.removed += len(deletes)
+    return report
+
+
+def import_document(conn: sqlite3.Connection, filename: str, content: bytes) -> ImportReport:
+    report = ImportReport()
+    return apply_import(conn, iter_document_rows(filename, content, report), report)
+
+
+def export_catalog(conn: sqlite3.Connection, stream: IO[str]) -> int:
+    writer = csv.writer(stream)
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    cursor = conn.execute(
+        """
+        SELECT s.name AS section, sub.name AS subsection, p.name, p.price
+        FROM products p
+        JOIN subsections sub ON sub.id = p.subsection_id
+        JOIN sections s ON s.id = sub.section_id
+        ORDER BY s.id, sub.id, p.id
+        """
+    )
+    for row in cursor:
+        writer.writerow(tuple(row))
+        count += 1
+    return count
@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from aiogram import Bot, Dispatcher, loggers
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+from aiohttp import web
+
+from config import Settings
+from scheduling import ChatEventIsolation
+from webhook import SECRET_HEADER, serve_webhook_app
+
+
+LINE_LIMIT = 2**22
+POLL_TIMEOUT = 30
+MAX_POLL_BACKOFF = 30.0
+RESTART_DELAY = 1.0
+SEND_ATTEMPTS = 2
+CATALOG_CHANGED = "catalog_changed"
+RELOAD_CATALOG = "reload_catalog"
+WORKER_READY = "ready"
+WORKER_STATS = "stats"
+HAND_OFF = "hand_off"
+NOTIFY_ORDER = "notify_order"
+RUN_BROADCAST = "run_broadcast"
+PRIMARY_WORKER = 0
+
+
+def update_chat_key(update: dict[str, Any]) -> int:
+    for event in update.values():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat is not None:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user is not None:
+            return user["id"]
+    return update.get("update_id", 0)
+
+
+def encode_line(message: dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class WorkerLink:
+    def __init__(self, index: int | None) -> None:
+        self.index = index
+
+    @property
+    def active(self) -> bool:
+        return self.index is not None
+
+    def emit(self, event: str, **payload: Any) -> None:
+        if not self.active:
+            return
+        sys.stdout.buffer.write(encode_line({"event": event, "worker": self.index, **payload}))
+        sys.stdout.flush()
+
+    def hand_off(self, control: str, **payload: Any) -> None:
+        self.emit(HAND_OFF, control=control, payload=payload)
+
+
+class WorkerProcess:
+    def __init__(self, index: int, command: list[str], env: dict[str, str]) -> None:
+        self.index = index
+        self.command = command
+        self.env = env
+        self.routed = 0
+        self.restarts = 0
+        self.ready = asyncio.Event()
+        self.process: asyncio.subprocess.Process | None = None
+        self._restart_lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None and not self.process.stdin.is_closing()
+
+    async def start(self) -> None:
+        self.ready.clear()
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            env={**self.env, "WORKER_INDEX": str(self.index), "WORKER_RESTARTS": str(self.restarts)},
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=LINE_LIMIT,
+        )
+
+    async def restart(self) -> None:
+        async with self._restart_lock:
+            if self.alive:
+                return
+            process = self.process
+            if not process.stdin.is_closing():
+                process.stdin.close()
+            if process.returncode is None:
+                process.kill()
+            code = await process.wait()
+            loggers.dispatcher.warning("Worker %s exited with code %s; restarting", self.index, code)
+            self.restarts += 1
+            await self.start()
+
+    async def send(self, message: dict[str, Any]) -> None:
+        if not self.alive:
+            raise ConnectionResetError(f"worker {self.index} is not running")
+        self.process.stdin.write(encode_line(message))
+        await self.process.stdin.drain()
+
+    async def events(self) -> AsyncIterator[dict[str, Any]]:
+        async for line in self.process.stdout:
+            yield json.loads(line)
+
+    async def stop(self) -> int:
+        if not self.process.stdin.is_closing():
+            if self.process.stdin.can_write_eof():
+                self.process.stdin.write_eof()
+            self.process.stdin.close()
+        return await self.process.wait()
+
+
+class Supervisor:
+    def __init__(self, workers: int, command: list[str], env: dict[str, str] | None = None) -> None:
+        environment = dict(os.environ if env is None else env)
+        self.workers = [WorkerProcess(index, command, environment) for index in range(workers)]
+        self.stats: dict[int, dict[str, Any]] = {}
+        self.catalog_broadcasts = 0
+        self.dropped = 0
+        self._stopping = False
+        self._relays: list[asyncio.Task[None]] = []
+
+    async def start(self) -> None:
+        for worker in self.workers:
+            await worker.start()
+            self._relays.append(asyncio.create_task(self._watch(worker)))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for worker in self.workers:
+            await worker.stop()
+        await asyncio.gather(*self._relays, return_exceptions=True)
+        self._relays.clear()
+
+    async def wait_ready(self) -> None:
+        await asyncio.gather(*(worker.ready.wait() for worker in self.workers))
+
+    def worker_for(self, update: dict[str, Any]) -> WorkerProcess:
+        return self.workers[update_chat_key(update) % len(self.workers)]
+
+    async def route(self, update: dict[str, Any]) -> None:
+        worker = self.worker_for(update)
+        worker.routed += 1
+        if not await self._deliver(worker, {"update": update}):
+            self.dropped += 1
+            loggers.dispatcher.error("Dropped update id=%s: worker %s is unavailable", update.get("update_id"), worker.index)
+
+    async def _deliver(self, worker: WorkerProcess, message: dict[str, Any]) -> bool:
+        for _ in range(SEND_ATTEMPTS):
+            try:
+                await worker.send(message)
+                return True
+            except (ConnectionResetError, BrokenPipeError):
+                if self._stopping:
+                    return False
+                await worker.restart()
+        return False
+
+    async def _watch(self, worker: WorkerProcess) -> None:
+        while True:
+            process = worker.process
+            await self._relay(worker)
+            await process.wait()
+            if self._stopping:
+                return
+            if worker.process is process:
+                await asyncio.sleep(RESTART_DELAY)
+                if not self._stopping:
+                    await worker.restart()
+
+    async def _relay(self, worker: WorkerProcess) -> None:
+        async for event in worker.events():
+            if event.get("event") == CATALOG_CHANGED:
+                self.catalog_broadcasts += 1
+                for other in self.workers:
+                    if other is not worker and other.alive:
+                        await self._deliver(other, {"control": RELOAD_CATALOG})
+            elif event.get("event") == HAND_OFF:
+                message = {"control": event["control"], "payload": event["payload"]}
+                if not await self._deliver(self.workers[PRIMARY_WORKER], message):
+                    loggers.dispatcher.error("Dropped %s from worker %s: primary worker is unavailable", message, worker.index)
+            elif event.get("event") == WORKER_READY:
+                worker.ready.set()
+            elif event.get("event") == WORKER_STATS:
+                self.stats[worker.index] = event
+
+
+async def poll_updates(bot: Bot, supervisor: Supervisor, allowed_updates: list[str]) -> None:
+    offset = None
+    backoff = 1.0
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed_updates)
+        except (TelegramNetworkError, TelegramServerError) as exc:
+            loggers.dispatcher.warning("Failed to fetch updates: %s; retrying in %.0f s", exc, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_POLL_BACKOFF)
+            continue
+
+        backoff = 1.0
+        for update in updates:
+            await supervisor.route(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
+
+
+def create_router_app(supervisor: Supervisor, settings: Settings) -> web.Application:
+    async def receive(request: web.Request) -> web.Response:
+        if request.headers.get(SECRET_HEADER) != settings.webhook_secret:
+            return web.Response(status=401)
+        await supervisor.route(await request.json())
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(settings.webhook_path, receive)
+    return app
+
+
+async def run_supervisor(settings: Settings, allowed_updates: list[str]) -> None:
+    supervisor = Supervisor(settings.bot_workers, [sys.executable, __file__, "--worker"])
+    bot = Bot(settings.bot_token)
+    await supervisor.start()
+    try:
+        if settings.bot_mode == "webhook":
+            await serve_webhook_app(create_router_app(supervisor, settings), bot, settings, allowed_updates)
+        else:
+            await bot.delete_webhook()
+            await poll_updates(bot, supervisor, allowed_updates)
+    finally:
+        await supervisor.stop()
+        await bot.session.close()
+
+
+async def _feed(dp: Dispatcher, bot: Bot, update: dict[str, Any]) -> None:
+    try:
+        await dp.feed_raw_update(bot, update)
+    except Exception:
+        loggers.event.exception("Cause exception while process update id=%s", update.get("update_id"))
+
+
+async def serve_worker(
+    dp: Dispatcher,
+    bot: Bot,
+    isolation: ChatEventIsolation,
+    on_control: Callable[[str, dict[str, Any]], Awaitable[None]],
+) -> int:
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    loop = asyncio.get_running_loop()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    handled = 0
+    running: set[asyncio.Task[None]] = set()
+    while line := await reader.readline():
+        message = json.loads(line)
+        if "control" in message:
+            await on_control(message["control"], message.get("payload", {}))
+            continue
+        await isolation.wait_for_room()
+        task = asyncio.create_task(_feed(dp, bot, message["update"]))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        handled += 1
+    await asyncio.gather(*running)
+    return handled
+
+
+async def run_worker(fake: bool = False) -> None:
+    import bot as store
+    from fakes import FakeSession, fake_bot
+    from metrics import start_metrics_server
+
+    store.init_db()
+    session = FakeSession() if fake else None
+    bot = fake_bot(session) if fake else Bot(store.settings.bot_token)
+    dp = store.build_dispatcher()
+    metrics_runner = None
+    if store.settings.metrics_port:
+        port = store.settings.metrics_port + store.worker_link.index
+        metrics_runner = await start_metrics_server(store.metrics, store.settings.metrics_host, port)
+
+    async def on_control(control: str, payload: dict[str, Any]) -> None:
+        if control == RELOAD_CATALOG:
+            await store.db.run(store.catalog.reload)
+        elif control == NOTIFY_ORDER:
+            store.order_notifier.submit(payload["order_id"])
+        elif control == RUN_BROADCAST:
+            await store.broadcaster.run_job(bot, payload["job_id"], payload["chat_id"])
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    store.worker_link.emit(WORKER_READY)
+    try:
+        handled = await serve_worker(dp, bot, store.event_isolation, on_control)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if not fake:
+            await bot.session.close()
+        store.db.close()
+
+    store.worker_link.emit(
+        WORKER_STATS,
+        updates=handled,
+        api_calls=len(session.requests) if session is not None else None,
+        catalog_version=store.catalog.version,
+    )
+
+
+async def run_local_cluster(workers: int, users: int) -> None:
+    from bench import BENCH_ADMIN_ID, user_script
+    from fakes import FAKE_BOT_TOKEN, message_update
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update(
+            BOT_TOKEN=FAKE_BOT_TOKEN,
+            ADMIN_ID=str(BENCH_ADMIN_ID),
+            DB_PATH=str(Path(tmp) / "cluster.db"),
+            BOT_MODE="polling",
+            BOT_WORKERS=str(workers),
+        )
+        os.environ.update(env)
+        import bot as store
+
+        store.init_db()
+        scripts = [user_script(store, user_id) for user_id in range(1000, 1000 + users)]
+        store.db.close()
+
+        supervisor = Supervisor(workers, [sys.executable, __file__, "--worker", "--fake"], env)
+        await supervisor.start()
+        await supervisor.wait_ready()
+        started = time.perf_counter()
+        try:
+            await supervisor.route(message_update(BENCH_ADMIN_ID, "/add_section Кластер"))
+            while not supervisor.catalog_broadcasts:
+                await asyncio.sleep(0.05)
+            for step in range(max(len(script) for script in scripts)):
+                for script in scripts:
+                    if step < len(script):
+                        await supervisor.route(script[step])
+        finally:
+            await supervisor.stop()
+        elapsed = time.perf_counter() - started
+        with sqlite3.connect(env["DB_PATH"]) as conn:
+            orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    routed = sum(worker.routed for worker in supervisor.workers)
+    print(f"{workers} workers, {users} users: {routed} updates in {elapsed:.2f} s ({routed / elapsed:.0f} upd/s)")
+    print(f"orders saved: {orders}, catalog change broadcasts: {supervisor.catalog_broadcasts}")
+    for worker in supervisor.workers:
+        stats = supervisor.stats.get(worker.index, {})
+        print(
+            f"worker {worker.index}: routed {worker.routed}, handled {stats.get('updates')}, "
+            f"api calls {stats.get('api_calls')}, catalog version {stats.get('catalog_version')}, "
+            f"restarts {worker.restarts}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the store bot as a supervisor with sharded worker processes")
+    parser.add_argument("--local", action="store_true", help="route synthetic updates to workers with a fake Telegram API")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fake", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(run_worker(args.fake))
+    elif args.local:
+        asyncio.run(run_local_cluster(args.workers, args.users))
+    else:
+        import bot as store
+
+        asyncio.run(store.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,128 @@
- from dataclasses import dataclass
- import os
- 
- from dotenv import load_dotenv
- 
- 
- load_dotenv()
- 
- 
- @dataclass(frozen=True)
- class Settings:
-     bot_token: str
-     admin_id: int
--    catalog_url: str
- 
- 
- def load_settings() -> Settings:
-     token = os.getenv("BOT_TOKEN", "")
-     admin_id_raw = os.getenv("ADMIN_ID", "")
--    catalog_url = os.getenv(
--        "CATALOG_URL",
--        "https://docs.google.com/spreadsheets/d/1ArypBF_3ifwFoMIxQrvlPNiToVox6WHhIULsLkITsLI/edit?usp=drivesdk",
--    )
- 
-     if not token:
-         raise RuntimeError("BOT_TOKEN is not set. Add it to environment or .env file.")
-     if not admin_id_raw:
-         raise RuntimeError("ADMIN_ID is not set. Add it to environment or .env file.")
- 
--    return Settings(bot_token=token, admin_id=int(admin_id_raw), catalog_url=catalog_url)
-+    return Settings(bot_token=token, admin_id=int(admin_id_raw))
+from dataclasses import dataclass
+import os
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class Settings:
+    bot_token: str
+    admin_id: int
+    db_path: str = "bot_store.db"
+    db_pool_size: int = 4
+    db_workers: int = 2
+    fsm_storage: str = "sqlite"
+    fsm_flush_interval: float = 0.5
+    user_flush_interval: float = 2.0
+    redis_url: str = "redis://localhost:6379/0"
+    broadcast_rate: float = 25.0
+    broadcast_concurrency: int = 8
+    bot_mode: str = "polling"
+    webhook_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_secret: str = ""
+    webapp_host: str = "0.0.0.0"
+    webapp_port: int = 8080
+    metrics_enabled: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    catalog_url: str = ""
+    catalog_sync_interval: float = 600.0
+    update_concurrency: int = 64
+    update_max_pending: int = 1000
+    bot_workers: int = 1
+    stock_reservation_ttl: float = 900.0
+    worker_index: int | None = None
+    worker_restarts: int = 0
+
+
+def load_settings() -> Settings:
+    token = os.getenv("BOT_TOKEN", "")
+    admin_id_raw = os.getenv("ADMIN_ID", "")
+    db_path = os.getenv("DB_PATH", "bot_store.db")
+    db_pool_size = int(os.getenv("DB_POOL_SIZE", "4"))
+    db_workers = int(os.getenv("DB_WORKERS", "2"))
+    fsm_storage = os.getenv("FSM_STORAGE", "sqlite").lower()
+    fsm_flush_interval = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))
+    user_flush_interval = float(os.getenv("USER_FLUSH_INTERVAL", "2"))
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    broadcast_rate = float(os.getenv("BROADCAST_RATE", "25"))
+    broadcast_concurrency = int(os.getenv("BROADCAST_CONCURRENCY", "8"))
+    bot_mode = os.getenv("BOT_MODE", "polling").lower()
+    webhook_url = os.getenv("WEBHOOK_URL", "")
+    webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+    webapp_host = os.getenv("WEBAPP_HOST", "0.0.0.0")
+    webapp_port = int(os.getenv("WEBAPP_PORT", "8080"))
+    metrics_enabled = os.getenv("METRICS_ENABLED", "0").lower() in {"1", "true", "yes", "on"}
+    metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    catalog_url = os.getenv("CATALOG_URL", "")
+    catalog_sync_interval = float(os.getenv("CATALOG_SYNC_INTERVAL", "600"))
+    update_concurrency = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+    update_max_pending = int(os.getenv("UPDATE_MAX_PENDING", "1000"))
+    bot_workers = int(os.getenv("BOT_WORKERS", "1"))
+    worker_index_raw = os.getenv("WORKER_INDEX", "")
+    worker_restarts = int(os.getenv("WORKER_RESTARTS", "0"))
+    stock_reservation_ttl = float(os.getenv("STOCK_RESERVATION_TTL", "900"))
+
+    if not token:
+        raise RuntimeError("BOT_TOKEN is not set. Add it to environment or .env file.")
+    if not admin_id_raw:
+        raise RuntimeError("ADMIN_ID is not set. Add it to environment or .env file.")
+    if db_pool_size < 1:
+        raise RuntimeError("DB_POOL_SIZE must be a positive integer.")
+    if db_workers < 1:
+        raise RuntimeError("DB_WORKERS must be a positive integer.")
+    if fsm_storage not in {"memory", "sqlite", "redis"}:
+        raise RuntimeError("FSM_STORAGE must be one of: memory, sqlite, redis.")
+    if broadcast_rate <= 0 or broadcast_concurrency < 1:
+        raise RuntimeError("BROADCAST_RATE and BROADCAST_CONCURRENCY must be positive.")
+    if bot_mode not in {"polling", "webhook"}:
+        raise RuntimeError("BOT_MODE must be either polling or webhook.")
+    if bot_mode == "webhook" and not webhook_url:
+        raise RuntimeError("WEBHOOK_URL is not set. It is required when BOT_MODE=webhook.")
+    if bot_mode == "webhook" and not webhook_secret:
+        raise RuntimeError("WEBHOOK_SECRET is not set. It is required when BOT_MODE=webhook.")
+    if catalog_sync_interval <= 0:
+        raise RuntimeError("CATALOG_SYNC_INTERVAL must be positive.")
+    if update_concurrency < 1 or update_max_pending < 1:
+        raise RuntimeError("UPDATE_CONCURRENCY and UPDATE_MAX_PENDING must be positive integers.")
+    if bot_workers < 1:
+        raise RuntimeError("BOT_WORKERS must be a positive integer.")
+    if stock_reservation_ttl <= 0:
+        raise RuntimeError("STOCK_RESERVATION_TTL must be positive.")
+
+    return Settings(
+        bot_token=token,
+        admin_id=int(admin_id_raw),
+        db_path=db_path,
+        db_pool_size=db_pool_size,
+        db_workers=db_workers,
+        fsm_storage=fsm_storage,
+        fsm_flush_interval=fsm_flush_interval,
+        user_flush_interval=user_flush_interval,
+        redis_url=redis_url,
+        broadcast_rate=broadcast_rate,
+        broadcast_concurrency=broadcast_concurrency,
+        bot_mode=bot_mode,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webapp_host=webapp_host,
+        webapp_port=webapp_port,
+        metrics_enabled=metrics_enabled,
+        metrics_host=metrics_host,
+        metrics_port=metrics_port,
+        catalog_url=catalog_url,
+        catalog_sync_interval=catalog_sync_interval,
+        update_concurrency=update_concurrency,
+        update_max_pending=update_max_pending,
+        bot_workers=bot_workers,
+        worker_index=int(worker_index_raw) if worker_index_raw else None,
+        worker_restarts=worker_restarts,
+        stock_reservation_ttl=stock_reservation_ttl,
+    )
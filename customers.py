@@ -0,0 +1,76 @@
+import sqlite3
+from dataclasses import dataclass
+
+
+RECENT_ADDRESSES = 3
+
+
+@dataclass(frozen=True)
+class CustomerProfile:
+    name: str
+    phone: str
+    addresses: tuple[str, ...]
+
+
+def load_profile(conn: sqlite3.Connection, user_id: int) -> CustomerProfile | None:
+    rows = conn.execute(
+        """
+        SELECT c.name, c.phone, a.address
+        FROM customers c
+        LEFT JOIN customer_addresses a ON a.user_id = c.user_id
+        WHERE c.user_id = ?
+        ORDER BY a.last_order_id DESC
+        """,
+        (user_id,),
+    ).fetchall()
+    if not rows:
+        return None
+    addresses = tuple(row["address"] for row in rows if row["address"] is not None)
+    return CustomerProfile(rows[0]["name"], rows[0]["phone"], addresses)
+
+
+def save_profile(
+    conn: sqlite3.Connection,
+    user_id: int,
+    name: str | None,
+    phone: str | None,
+    address: str | None,
+    order_id: int,
+) -> None:
+    if not (name and phone and address):
+        return
+    conn.execute(
+        """
+        INSERT INTO customers(user_id, name, phone) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, phone = excluded.phone
+        """,
+        (user_id, name, phone),
+    )
+    conn.execute(
+        """
+        INSERT INTO customer_addresses(user_id, address, last_order_id) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, address) DO UPDATE SET last_order_id = excluded.last_order_id
+        """,
+        (user_id, address, order_id),
+    )
+    conn.execute(
+        """
+        DELETE FROM customer_addresses
+        WHERE user_id = ? AND address NOT IN (
+            SELECT address FROM customer_addresses WHERE user_id = ? ORDER BY last_order_id DESC LIMIT ?
+        )
+        """,
+        (user_id, user_id, RECENT_ADDRESSES),
+    )
+
+
+def last_order_items(conn: sqlite3.Connection, user_id: int) -> list[tuple[int, int]]:
+    rows = conn.execute(
+        """
+        SELECT product_id, quantity FROM order_items
+        WHERE order_id = (SELECT MAX(id) FROM orders WHERE user_id = ?)
+        ORDER BY rowid
+        """,
+        (user_id,),
+    ).fetchall()
+    return [(row["product_id"], row["quantity"]) for row in rows]
@@ -0,0 +1,150 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from queue import LifoQueue
+from typing import Any, Callable, ContextManager, Iterator, Sequence, TypeVar
+
+
+CONNECTION_PRAGMAS = (
+    ("synchronous", "NORMAL"),
+    ("cache_size", "-16000"),
+    ("mmap_size", str(64 * 1024 * 1024)),
+    ("temp_store", "MEMORY"),
+    ("foreign_keys", "ON"),
+)
+STATEMENT_CACHE_SIZE = 256
+
+T = TypeVar("T")
+
+
+class ConnectionPool:
+    def __init__(self, path: Path | str, size: int = 4) -> None:
+        self.path = Path(path)
+        self.size = size
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue(maxsize=size)
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def open(self) -> None:
+        with self._lock:
+            if self._connections:
+                return
+            for _ in range(self.size):
+                conn = self._connect()
+                self._connections.append(conn)
+                self._idle.put(conn)
+            self._connections[0].execute("PRAGMA journal_mode=WAL")
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            while not self._idle.empty():
+                self._idle.get_nowait()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        if not self._connections:
+            self.open()
+        conn = self._idle.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+
+def _fetchone(conn: sqlite3.Connection, sql: str, params: Sequence[Any]) -> sqlite3.Row | None:
+    return conn.execute(sql, params).fetchone()
+
+
+def _fetchall(conn: sqlite3.Connection, sql: str, params: Sequence[Any]) -> list[sqlite3.Row]:
+    return conn.execute(sql, params).fetchall()
+
+
+def _execute(conn: sqlite3.Connection, sql: str, params: Sequence[Any]) -> int:
+    return conn.execute(sql, params).rowcount
+
+
+class Database:
+    def __init__(
+        self,
+        path: Path | str,
+        pool_size: int = 4,
+        workers: int = 2,
+        observe: Callable[[str, float], None] | None = None,
+    ) -> None:
+        self.pool = ConnectionPool(path, max(pool_size, workers))
+        self.workers = workers
+        self.observe = observe
+        self._executor: ThreadPoolExecutor | None = None
+        self._queued = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def queued_jobs(self) -> int:
+        return self._queued
+
+    def open(self) -> None:
+        self.pool.open()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="db")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.pool.close()
+
+    def connection(self) -> ContextManager[sqlite3.Connection]:
+        return self.pool.connection()
+
+    def _call(self, name: str, fn: Callable[..., T], args: tuple[Any, ...]) -> T:
+        with self._counter_lock:
+            self._queued -= 1
+        if self.observe is None:
+            with self.pool.connection() as conn:
+                return fn(conn, *args)
+
+        started = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                return fn(conn, *args)
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    async def _submit(self, name: str, fn: Callable[..., T], args: tuple[Any, ...]) -> T:
+        if self._executor is None:
+            self.open()
+        with self._counter_lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, name, fn, args)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await self._submit(getattr(fn, "__name__", type(fn).__name__), fn, args)
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Row | None:
+        return await self._submit(sql, _fetchone, (sql, params))
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> list[sqlite3.Row]:
+        return await self._submit(sql, _fetchall, (sql, params))
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        return await self._submit(sql, _execute, (sql, params))
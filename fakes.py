@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import time
+from typing import Any, AsyncGenerator, Dict, Optional, Union, get_args, get_origin
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, InputFile, Message, PhotoSize, User
+
+
+FAKE_BOT_TOKEN = "42:FAKE-TOKEN-FOR-LOCAL-RUNS"
+
+
+class FakeSession(BaseSession):
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.requests: list[TelegramMethod[Any]] = []
+        self.results: dict[type, Any] = {}
+        self.uploads = 0
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None,
+    ) -> TelegramType:
+        self.requests.append(method)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        result = self.results.get(type(method))
+        if isinstance(result, Exception):
+            raise result
+        if result is not None:
+            return result
+        return self._default_result(bot, method)
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    def _default_result(self, bot: Bot, method: TelegramMethod[Any]) -> Any:
+        if isinstance(method, GetMe):
+            return User(id=bot.id, is_bot=True, first_name="Fake", username="fake_bot")
+
+        returning = method.__returning__
+        options = get_args(returning) if get_origin(returning) is Union else (returning,)
+        if Message in options:
+            return self._message(method, getattr(method, "photo", None))
+        if bool in options:
+            return True
+        if get_origin(returning) is list and get_args(returning) == (Message,):
+            return [self._message(method, getattr(item, "media", None)) for item in getattr(method, "media", [None])]
+        return None
+
+    def _message(self, method: TelegramMethod[Any], photo: str | InputFile | None = None) -> Message:
+        chat_id = getattr(method, "chat_id", 0)
+        return Message(
+            message_id=next(self._message_ids),
+            date=int(time.time()),
+            chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+            text=getattr(method, "text", None),
+            photo=[self._photo(photo)] if photo is not None else None,
+        )
+
+    def _photo(self, media: str | InputFile) -> PhotoSize:
+        if isinstance(media, str):
+            file_id = media
+        else:
+            self.uploads += 1
+            file_id = f"fake-photo-{next(self._file_ids)}"
+        return PhotoSize(file_id=file_id, file_unique_id=file_id, width=800, height=800)
+
+
+def fake_bot(session: FakeSession | None = None) -> Bot:
+    return Bot(FAKE_BOT_TOKEN, session=session or FakeSession())
+
+
+_update_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+
+
+def _chat(user_id: int) -> dict[str, Any]:
+    return {"id": user_id, "type": "private"}
+
+
+def message_update(user_id: int, text: str) -> dict[str, Any]:
+    update: dict[str, Any] = {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_update_ids),
+            "date": int(time.time()),
+            "chat": _chat(user_id),
+            "from": _user(user_id),
+            "text": text,
+        },
+    }
+    if text.startswith("/"):
+        command = text.split(maxsplit=1)[0]
+        update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return update
+
+
+def photo_update(user_id: int, file_id: str, caption: str = "") -> dict[str, Any]:
+    update = message_update(user_id, caption)
+    message = update["message"]
+    message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 800}]
+    message["caption"] = message.pop("text")
+    if "entities" in message:
+        message["caption_entities"] = message.pop("entities")
+    return update
+
+
+def callback_update(user_id: int, data: str, message_id: int = 1) -> dict[str, Any]:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": _chat(user_id),
+                "from": {"id": 42, "is_bot": True, "first_name": "Fake"},
+                "text": "…",
+            },
+        },
+    }
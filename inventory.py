@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Awaitable, Callable, Iterable
+
+from cart import CartLine
+from db import Database
+
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 60.0
+
+StockLevels = dict[int, int | None]
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product_ids: list[int]) -> None:
+        super().__init__(f"not enough stock for products {product_ids}")
+        self.product_ids = product_ids
+
+
+def _return_stock(conn: sqlite3.Connection, reservations: list[sqlite3.Row], levels: StockLevels) -> None:
+    for row in reservations:
+        returned = conn.execute(
+            "UPDATE products SET stock = stock + ? WHERE id = ? RETURNING stock",
+            (row["quantity"], row["product_id"]),
+        ).fetchone()
+        if returned is not None:
+            levels[row["product_id"]] = returned[0]
+
+
+def release_reservations(conn: sqlite3.Connection, user_id: int) -> StockLevels:
+    levels: StockLevels = {}
+    reservations = conn.execute(
+        "DELETE FROM stock_reservations WHERE user_id = ? RETURNING product_id, quantity",
+        (user_id,),
+    ).fetchall()
+    _return_stock(conn, reservations, levels)
+    return levels
+
+
+def take_stock(conn: sqlite3.Connection, user_id: int, lines: Iterable[CartLine]) -> StockLevels:
+    levels = release_reservations(conn, user_id)
+    short = []
+    for line in lines:
+        taken = conn.execute(
+            """
+            UPDATE products SET stock = stock - ?
+            WHERE id = ? AND (stock IS NULL OR stock >= ?)
+            RETURNING stock
+            """,
+            (line.quantity, line.product_id, line.quantity),
+        ).fetchone()
+        if taken is None:
+            short.append(line.product_id)
+        else:
+            levels[line.product_id] = taken[0]
+    if short:
+        raise OutOfStockError(short)
+    return levels
+
+
+def reserve_stock(conn: sqlite3.Connection, user_id: int, lines: tuple[CartLine, ...], ttl: float) -> StockLevels:
+    levels = take_stock(conn, user_id, lines)
+    expires_at = time.time() + ttl
+    conn.executemany(
+        "INSERT INTO stock_reservations(user_id, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)",
+        [(user_id, line.product_id, line.quantity, expires_at) for line in lines],
+    )
+    return levels
+
+
+def sweep_reservations(conn: sqlite3.Connection, now: float | None = None) -> StockLevels:
+    levels: StockLevels = {}
+    expired = conn.execute(
+        "DELETE FROM stock_reservations WHERE expires_at <= ? RETURNING product_id, quantity",
+        (time.time() if now is None else now,),
+    ).fetchall()
+    _return_stock(conn, expired, levels)
+    return levels
+
+
+class ReservationSweeper:
+    def __init__(
+        self,
+        db: Database,
+        on_change: Callable[[StockLevels], Awaitable[None]],
+        interval: float = SWEEP_INTERVAL,
+    ) -> None:
+        self.db = db
+        self.on_change = on_change
+        self.interval = interval
+        self.failed = 0
+        self.last_error: str | None = None
+        self._worker: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as exc:
+                self.failed += 1
+                self.last_error = str(exc) or type(exc).__name__
+                logger.exception("Reservation sweep failed")
+
+    async def sweep(self) -> StockLevels:
+        levels = await self.db.run(sweep_reservations)
+        self.last_error = None
+        if levels:
+            await self.on_change(levels)
+        return levels
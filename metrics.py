@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.handlers: dict[str, Histogram] = {}
+        self.jobs: dict[str, Histogram] = {}
+        self.gauges: dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe_handler(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.handlers.setdefault(name, Histogram()).observe(seconds)
+
+    def observe_job(self, name: str, seconds: float) -> None:
+        job = _WHITESPACE.sub(" ", name).strip()[:120]
+        with self._lock:
+            self.jobs.setdefault(job, Histogram()).observe(seconds)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        self.gauges[name] = read
+
+    def summary(self, limit: int = 8) -> str:
+        lines = ["Обработчики (вызовов, p50/p99 мс):"]
+        lines.extend(_summary_rows(self.handlers, limit))
+        lines.append("\nЗапросы к БД (вызовов, p50/p99 мс):")
+        lines.extend(_summary_rows(self.jobs, limit))
+        if self.gauges:
+            lines.append("")
+            lines.extend(f"{name}: {read():g}" for name, read in self.gauges.items())
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            _render_family(lines, "bot_handler_seconds", "handler", self.handlers)
+            _render_family(lines, "bot_db_job_seconds", "job", self.jobs)
+        for name, read in self.gauges.items():
+            lines.append(f"# TYPE bot_{name} gauge")
+            lines.append(f"bot_{name} {read():g}")
+        return "\n".join(lines) + "\n"
+
+
+def _summary_rows(histograms: dict[str, Histogram], limit: int) -> list[str]:
+    ranked = sorted(histograms.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+    if not ranked:
+        return ["—"]
+    return [
+        f"{name}: {hist.count}, {hist.quantile(0.5) * 1000:g}/{hist.quantile(0.99) * 1000:g}"
+        for name, hist in ranked
+    ]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _render_family(lines: list[str], metric: str, label: str, histograms: dict[str, Histogram]) -> None:
+    lines.append(f"# TYPE {metric} histogram")
+    for name, hist in histograms.items():
+        labels = f'{label}="{_escape(name)}"'
+        cumulative = 0
+        for bound, bucket_count in zip(hist.buckets, hist.counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {hist.count}')
+        lines.append(f"{metric}_sum{{{labels}}} {hist.total:.6f}")
+        lines.append(f"{metric}_count{{{labels}}} {hist.count}")
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    def __init__(self, metrics: Metrics) -> None:
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.metrics.enabled:
+            return await handler(event, data)
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get("handler")
+            name = getattr(getattr(handler_object, "callback", None), "__name__", type(event).__name__)
+            self.metrics.observe_handler(name, time.perf_counter() - started)
+
+
+async def start_metrics_server(metrics: Metrics, host: str, port: int) -> web.AppRunner:
+    async def handle(_: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,181 @@
+import sqlite3
+
+
+MIGRATIONS: tuple[tuple[str, ...], ...] = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            first_seen_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS subsections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            FOREIGN KEY(section_id) REFERENCES sections(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subsection_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            FOREIGN KEY(subsection_id) REFERENCES subsections(id) ON DELETE CASCADE
+        )
+        """,
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS fsm_storage (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL DEFAULT '{}'
+        )
+        """,
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT
+        )
+        """,
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            customer_name TEXT,
+            customer_phone TEXT,
+            address TEXT,
+            total INTEGER NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            notified_at TEXT,
+            notify_attempts INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS order_items (
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_pending ON orders(id) WHERE notified_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)",
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS idx_subsections_section ON subsections(section_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_products_subsection ON products(subsection_id, id)",
+        """
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_counter_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'users';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_counter_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'users';
+        END
+        """,
+        "INSERT OR IGNORE INTO counters(name, value) SELECT 'users', COUNT(*) FROM users",
+    ),
+    (
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5(
+            product_id UNINDEXED,
+            body,
+            tokenize = 'trigram'
+        )
+        """,
+    ),
+    (
+        "ALTER TABLE products ADD COLUMN stock INTEGER",
+        """
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            user_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY(user_id, product_id),
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_stock_reservations_expiry ON stock_reservations(expires_at)",
+    ),
+    (
+        "ALTER TABLE products ADD COLUMN image TEXT",
+        "ALTER TABLE products ADD COLUMN image_file_id TEXT",
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS customers (
+            user_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS customer_addresses (
+            user_id INTEGER NOT NULL,
+            address TEXT NOT NULL,
+            last_order_id INTEGER NOT NULL,
+            PRIMARY KEY(user_id, address),
+            FOREIGN KEY(user_id) REFERENCES customers(user_id) ON DELETE CASCADE
+        )
+        """,
+    ),
+)
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> int:
+    start = schema_version(conn)
+    if start >= target:
+        return start
+
+    if conn.in_transaction:
+        conn.commit()
+    for version in range(start + 1, target + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) < version:
+                for statement in MIGRATIONS[version - 1]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return start
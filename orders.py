@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import sqlite3
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from cart import CartLine, CartSummary
+from customers import save_profile
+from db import Database
+from inventory import StockLevels, take_stock
+from outgoing import own_flood_retries
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 300.0
+
+
+@dataclass(frozen=True)
+class Order:
+    id: int
+    user_id: int
+    customer_name: str
+    customer_phone: str
+    address: str
+    summary: CartSummary
+    created_at: str = ""
+
+    @property
+    def admin_text(self) -> str:
+        return (
+            f"🧾 Новый заказ №{self.id}\n"
+            f"Покупатель: {self.customer_name}\n"
+            f"Телефон: {self.customer_phone}\n"
+            f"Адрес: {self.address}\n\n"
+            f"{self.summary.text}"
+        )
+
+
+def create_order(
+    conn: sqlite3.Connection,
+    user_id: int,
+    customer_name: str,
+    customer_phone: str,
+    address: str,
+    summary: CartSummary,
+) -> Order:
+    order_id = conn.execute(
+        """
+        INSERT INTO orders(user_id, customer_name, customer_phone, address, total)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (user_id, customer_name, customer_phone, address, summary.total),
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO order_items(order_id, product_id, name, price, quantity) VALUES (?, ?, ?, ?, ?)",
+        [(order_id, line.product_id, line.name, line.price, line.quantity) for line in summary.lines],
+    )
+    return Order(order_id, user_id, customer_name, customer_phone, address, summary)
+
+
+def place_order(
+    conn: sqlite3.Connection,
+    user_id: int,
+    customer_name: str,
+    customer_phone: str,
+    address: str,
+    summary: CartSummary,
+) -> tuple[Order, StockLevels]:
+    levels = take_stock(conn, user_id, summary.lines)
+    order = create_order(conn, user_id, customer_name, customer_phone, address, summary)
+    save_profile(conn, user_id, customer_name, customer_phone, address, order.id)
+    return order, levels
+
+
+def load_order(conn: sqlite3.Connection, order_id: int) -> Order | None:
+    row = conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
+    if row is None:
+        return None
+    items = conn.execute(
+        "SELECT product_id, name, price, quantity FROM order_items WHERE order_id = ? ORDER BY rowid",
+        (order_id,),
+    ).fetchall()
+    lines = tuple(CartLine(item["product_id"], item["name"], item["price"], item["quantity"]) for item in items)
+    return Order(
+        id=row["id"],
+        user_id=row["user_id"],
+        customer_name=row["customer_name"],
+        customer_phone=row["customer_phone"],
+        address=row["address"],
+        summary=CartSummary(lines=lines, total=row["total"]),
+        created_at=row["created_at"],
+    )
+
+
+def recent_orders(conn: sqlite3.Connection, user_id: int, limit: int = 5) -> list[sqlite3.Row]:
+    return conn.execute(
+        "SELECT id, total, created_at FROM orders WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+        (user_id, limit),
+    ).fetchall()
+
+
+def _pending_order_ids(conn: sqlite3.Connection) -> list[int]:
+    rows = conn.execute("SELECT id FROM orders WHERE notified_at IS NULL ORDER BY id").fetchall()
+    return [row[0] for row in rows]
+
+
+def _mark_notified(conn: sqlite3.Connection, order_id: int) -> None:
+    conn.execute(
+        "UPDATE orders SET notified_at = CURRENT_TIMESTAMP, notify_attempts = notify_attempts + 1 WHERE id = ?",
+        (order_id,),
+    )
+
+
+def _mark_attempt(conn: sqlite3.Connection, order_id: int) -> None:
+    conn.execute("UPDATE orders SET notify_attempts = notify_attempts + 1 WHERE id = ?", (order_id,))
+
+
+class OrderNotifier:
+    def __init__(
+        self,
+        db: Database,
+        admin_id: int,
+        max_attempts: int = 5,
+        base_delay: float = 2.0,
+        retry_delay: float = RETRY_DELAY,
+    ) -> None:
+        self.db = db
+        self.admin_id = admin_id
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.retry_delay = retry_delay
+        self.failed = 0
+        self.last_error: str | None = None
+        self._queue: asyncio.Queue[Order | int] = asyncio.Queue()
+        self._retries: dict[int, asyncio.TimerHandle] = {}
+        self._worker: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._retries)
+
+    def submit(self, order: Order | int) -> None:
+        self._queue.put_nowait(order)
+
+    async def start(self, bot: Bot, recover: bool = True) -> None:
+        if recover:
+            for order_id in await self.db.run(_pending_order_ids):
+                self._queue.put_nowait(order_id)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(bot))
+
+    async def stop(self) -> None:
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                order = item if isinstance(item, Order) else await self.db.run(load_order, item)
+                if order is not None:
+                    await self._deliver(bot, order)
+            except Exception as exc:
+                order_id = item.id if isinstance(item, Order) else item
+                self.failed += 1
+                self.last_error = str(exc) or type(exc).__name__
+                logger.exception("Failed to notify admin about order %s, retrying in %gs", order_id, self.retry_delay)
+                self._retry_later(order_id)
+            finally:
+                self._queue.task_done()
+
+    def _retry_later(self, order_id: int) -> None:
+        if order_id in self._retries:
+            return
+        self._retries[order_id] = asyncio.get_running_loop().call_later(self.retry_delay, self._requeue, order_id)
+
+    def _requeue(self, order_id: int) -> None:
+        del self._retries[order_id]
+        self._queue.put_nowait(order_id)
+
+    async def _deliver(self, bot: Bot, order: Order) -> None:
+        for attempt in range(self.max_attempts):
+            try:
+                with own_flood_retries():
+                    await bot.send_message(self.admin_id, order.admin_text)
+            except TelegramRetryAfter as exc:
+                await self.db.run(_mark_attempt, order.id)
+                if attempt + 1 == self.max_attempts:
+                    raise
+                await asyncio.sleep(exc.retry_after)
+            except TelegramAPIError:
+                await self.db.run(_mark_attempt, order.id)
+                if attempt + 1 == self.max_attempts:
+                    raise
+                await asyncio.sleep(self.base_delay * 2**attempt)
+            else:
+                await self.db.run(_mark_notified, order.id)
+                return
@@ -0,0 +1,191 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, TelegramMethod
+
+
+MAX_RETRIES = 3
+NOT_MODIFIED = "message is not modified"
+
+Fingerprint = tuple[int | None, int]
+
+_own_flood_retries: ContextVar[bool] = ContextVar("own_flood_retries", default=False)
+
+
+@contextmanager
+def own_flood_retries() -> Iterator[None]:
+    token = _own_flood_retries.set(True)
+    try:
+        yield
+    finally:
+        _own_flood_retries.reset(token)
+
+
+@dataclass
+class _Request:
+    method: TelegramMethod[Any]
+    make_request: NextRequestMiddlewareType[Any]
+    fingerprint: Fingerprint | None = None
+    waiters: list[asyncio.Future[Any]] = field(default_factory=list)
+    retry_flood: bool = True
+
+
+@dataclass
+class _ChatQueue:
+    items: deque[_Request] = field(default_factory=deque)
+    edits: dict[int, _Request] = field(default_factory=dict)
+    paused_until: float = 0.0
+    busy: bool = False
+
+
+class OutgoingRequests(BaseRequestMiddleware):
+    def __init__(self, max_retries: int = MAX_RETRIES, max_tracked: int = 10_000) -> None:
+        self.max_retries = max_retries
+        self.max_tracked = max_tracked
+        self.skipped_edits = 0
+        self.coalesced_edits = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0
+        self._queues: dict[int | str, _ChatQueue] = {}
+        self._shown: OrderedDict[tuple[int | str, int], Fingerprint] = OrderedDict()
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._queues)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[Any],
+        bot: Bot,
+        method: TelegramMethod[Any],
+    ) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        queue = self._queues.get(chat_id)
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and method.message_id is not None:
+            key = (chat_id, method.message_id)
+            fingerprint = self._fingerprint(key, method)
+            pending = queue.edits.get(method.message_id) if queue is not None else None
+            if pending is not None:
+                pending.method, pending.make_request, pending.fingerprint = method, make_request, fingerprint
+                pending.waiters.append(future)
+                self.coalesced_edits += 1
+                return await future
+            if queue is None and self._shown.get(key) == fingerprint:
+                self.skipped_edits += 1
+                return True
+            request = _Request(method, make_request, fingerprint, [future])
+            queue = queue or self._queues.setdefault(chat_id, _ChatQueue())
+            queue.edits[method.message_id] = request
+        else:
+            request = _Request(method, make_request, waiters=[future], retry_flood=not _own_flood_retries.get())
+            queue = queue or self._queues.setdefault(chat_id, _ChatQueue())
+
+        queue.items.append(request)
+        if queue.busy:
+            return await future
+
+        queue.busy = True
+        try:
+            while not future.done() and queue.items:
+                await self._process(bot, chat_id, queue, queue.items.popleft())
+        finally:
+            if queue.items:
+                asyncio.create_task(self._drain(bot, chat_id, queue))
+            else:
+                self._release(chat_id, queue)
+        return await future
+
+    async def _drain(self, bot: Bot, chat_id: int | str, queue: _ChatQueue) -> None:
+        try:
+            while queue.items:
+                await self._process(bot, chat_id, queue, queue.items.popleft())
+        finally:
+            self._release(chat_id, queue)
+
+    def _release(self, chat_id: int | str, queue: _ChatQueue) -> None:
+        queue.busy = False
+        if self._queues.get(chat_id) is queue:
+            del self._queues[chat_id]
+
+    async def _process(self, bot: Bot, chat_id: int | str, queue: _ChatQueue, request: _Request) -> None:
+        if request.fingerprint is not None:
+            queue.edits.pop(request.method.message_id, None)
+        try:
+            result = await self._send(bot, chat_id, queue, request)
+        except Exception as exc:
+            for waiter in request.waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+        else:
+            for waiter in request.waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
+
+    async def _send(self, bot: Bot, chat_id: int | str, queue: _ChatQueue, request: _Request) -> Any:
+        is_edit = request.fingerprint is not None
+        attempt = 0
+        while True:
+            delay = queue.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if is_edit:
+                key = (chat_id, request.method.message_id)
+                self._adopt_newer(queue, request)
+                if self._shown.get(key) == request.fingerprint:
+                    self.skipped_edits += 1
+                    return True
+
+            try:
+                result = await request.make_request(bot, request.method)
+            except TelegramRetryAfter as exc:
+                self.flood_waits += 1
+                self.flood_wait_seconds += exc.retry_after
+                queue.paused_until = max(queue.paused_until, time.monotonic() + exc.retry_after)
+                if not request.retry_flood or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                continue
+            except TelegramBadRequest as exc:
+                if not is_edit or NOT_MODIFIED not in exc.message:
+                    raise
+                result = True
+
+            if is_edit:
+                self._remember(key, request.fingerprint)
+            return result
+
+    def _adopt_newer(self, queue: _ChatQueue, request: _Request) -> None:
+        newer = queue.edits.pop(request.method.message_id, None)
+        if newer is None:
+            return
+        queue.items.remove(newer)
+        request.method, request.make_request, request.fingerprint = newer.method, newer.make_request, newer.fingerprint
+        request.waiters.extend(newer.waiters)
+        self.coalesced_edits += 1
+
+    def _fingerprint(self, key: tuple[int | str, int], method: EditMessageText | EditMessageReplyMarkup) -> Fingerprint:
+        markup = hash(method.reply_markup.model_dump_json()) if method.reply_markup is not None else 0
+        if isinstance(method, EditMessageText):
+            return hash((method.text, str(method.parse_mode))), markup
+        shown = self._shown.get(key)
+        return (shown[0] if shown is not None else None), markup
+
+    def _remember(self, key: tuple[int | str, int], fingerprint: Fingerprint) -> None:
+        self._shown[key] = fingerprint
+        self._shown.move_to_end(key)
+        if len(self._shown) > self.max_tracked:
+            self._shown.popitem(last=False)
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+
+from aiogram.types import FSInputFile, InputFile, Message, URLInputFile
+
+from catalog import Product
+from db import Database
+
+
+def image_input(source: str) -> str | InputFile:
+    if source.startswith(("http://", "https://")):
+        return URLInputFile(source)
+    if os.path.isfile(source):
+        return FSInputFile(source)
+    return source
+
+
+def sent_file_id(message: Message) -> str | None:
+    return message.photo[-1].file_id if message.photo else None
+
+
+def _save_file_id(conn: sqlite3.Connection, product_id: int, image: str, file_id: str) -> None:
+    conn.execute(
+        "UPDATE products SET image_file_id = ? WHERE id = ? AND image = ?",
+        (file_id, product_id, image),
+    )
+
+
+class PhotoCache:
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self._file_ids: dict[tuple[int, str], str] = {}
+
+    def media(self, product: Product) -> str | InputFile:
+        file_id = product.image_file_id or self._file_ids.get((product.id, product.image))
+        if file_id:
+            self.hits += 1
+            return file_id
+        self.misses += 1
+        return image_input(product.image)
+
+    async def remember(self, product: Product, message: Message) -> None:
+        file_id = sent_file_id(message)
+        key = (product.id, product.image)
+        if file_id is None or file_id in (product.image_file_id, self._file_ids.get(key)):
+            return
+        self._file_ids[key] = file_id
+        await self.db.run(_save_file_id, product.id, product.image, file_id)
@@ -0,0 +1,237 @@
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import math
+import re
+import sqlite3
+import tempfile
+from typing import IO, Awaitable, Callable, Iterator
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+from catalog import round_to_5
+from catalog_io import DEFAULT_SECTION, CatalogImportError, CatalogRow, ImportReport, apply_import, make_row
+from db import Database
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+FETCH_TIMEOUT = 30
+NAME_CANDIDATES = ("название", "товар", "наименование", "product", "name")
+PRICE_CANDIDATES = ("цена", "прайс", "стоимость", "price")
+
+
+def apply_markup(base_price: float) -> int:
+    if base_price <= 200:
+        multiplier = 1.8
+    elif base_price <= 250:
+        multiplier = 1.5
+    else:
+        multiplier = 1.35
+    return int(math.ceil(base_price * multiplier))
+
+
+def _extract_numeric_price(raw_value: str) -> float | None:
+    cleaned = raw_value.strip().replace("\xa0", " ")
+    cleaned = cleaned.replace("₽", "").replace("руб.", "").replace("р.", "")
+    cleaned = cleaned.replace(" ", "").replace(",", ".")
+    match = re.search(r"\d+(?:\.\d+)?", cleaned)
+    return float(match.group(0)) if match else None
+
+
+def _normalize_header(value: str) -> str:
+    return value.strip().lower().replace("ё", "е")
+
+
+def _pick_columns(headers: list[str]) -> tuple[int, int] | None:
+    normalized = [_normalize_header(h) for h in headers]
+    name_index = next((i for i, h in enumerate(normalized) if any(c in h for c in NAME_CANDIDATES)), None)
+    price_index = next((i for i, h in enumerate(normalized) if any(c in h for c in PRICE_CANDIDATES)), None)
+
+    if name_index is not None and price_index is not None:
+        return name_index, price_index
+    if len(headers) >= 2:
+        return 0, 1
+    return None
+
+
+def sheet_csv_url(url: str) -> str:
+    if "docs.google.com/spreadsheets" not in url:
+        return url
+
+    sheet_id_match = re.search(r"/d/([a-zA-Z0-9-_]+)", url)
+    if not sheet_id_match:
+        return url
+
+    parsed = urlparse(url)
+    query_gid = parse_qs(parsed.query).get("gid", [None])[0]
+    fragment_gid = parse_qs(parsed.fragment).get("gid", [None])[0]
+    gid = query_gid or fragment_gid or "0"
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id_match.group(1)}/export?format=csv&gid={gid}"
+
+
+def iter_price_rows(stream: IO[str], report: ImportReport) -> Iterator[CatalogRow]:
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    columns = _pick_columns(header) if header else None
+    if columns is None:
+        raise CatalogImportError("В прайсе не найдены колонки с названием и ценой")
+
+    name_col, price_col = columns
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        base_price = _extract_numeric_price(row[price_col]) if len(row) > max(name_col, price_col) else None
+        item = None
+        if base_price is not None:
+            item = make_row(DEFAULT_SECTION, "", row[name_col], round_to_5(apply_markup(base_price)))
+        if item is None:
+            report.skipped += 1
+            continue
+        yield item
+
+
+def import_price_sheet(conn: sqlite3.Connection, source: IO[bytes]) -> ImportReport:
+    report = ImportReport()
+    with io.TextIOWrapper(source, encoding="utf-8-sig", errors="replace", newline="") as stream:
+        return apply_import(conn, iter_price_rows(stream, report), report)
+
+
+class PriceSync:
+    def __init__(
+        self,
+        db: Database,
+        url: str,
+        interval: float,
+        on_change: Callable[[], Awaitable[None]],
+    ) -> None:
+        self.db = db
+        self.url = sheet_csv_url(url) if url else ""
+        self.interval = interval
+        self.on_change = on_change
+        self.last_report: ImportReport | None = None
+        self.last_error: str | None = None
+        self.failed = 0
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._digest: str | None = None
+        self._lock = asyncio.Lock()
+        self._session: aiohttp.ClientSession | None = None
+        self._worker: asyncio.Task[None] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    async def start(self) -> None:
+        if not self.enabled or (self._worker is not None and not self._worker.done()):
+            return
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as exc:
+                self.failed += 1
+                self.last_error = str(exc) or type(exc).__name__
+                logger.exception("Price sync failed")
+            await asyncio.sleep(self.interval)
+
+    async def sync(self) -> ImportReport | None:
+        async with self._lock:
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as body:
+                fetched = await self._fetch(body)
+                if fetched is None or fetched[0] == self._digest:
+                    if fetched is not None:
+                        _, self._etag, self._last_modified = fetched
+                    self.last_error = None
+                    return None
+                body.seek(0)
+                report = await self.db.run(import_price_sheet, body)
+
+            self._digest, self._etag, self._last_modified = fetched
+            self.last_report = report
+            self.last_error = None
+            if report.changed:
+                await self.on_change()
+            return report
+
+    async def _fetch(self, body: IO[bytes]) -> tuple[str, str | None, str | None] | None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT))
+
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
+        async with self._session.get(self.url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                digest.update(chunk)
+                body.write(chunk)
+            return digest.hexdigest(), response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+
+async def run_local_harness() -> None:
+    import os
+    from email.utils import formatdate
+
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "price_sync.db")
+    import bot as store
+
+    sheet = {"body": "Наименование,Цена\nHUSKY DOUBLE ICE Ice Cherry,190\nHUSKY DOUBLE ICE Mango,240\n"}
+
+    async def serve(request: web.Request) -> web.Response:
+        data = sheet["body"].encode()
+        etag = '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        return web.Response(body=data, headers={"ETag": etag, "Last-Modified": formatdate(usegmt=True)})
+
+    app = web.Application()
+    app.router.add_get("/sheet.csv", serve)
+
+    store.init_db()
+    async with TestServer(app) as server:
+        sync = PriceSync(store.db, str(server.make_url("/sheet.csv")), 60, store.refresh_catalog)
+        try:
+            for step in ("initial", "unchanged", "price change"):
+                if step == "price change":
+                    sheet["body"] = sheet["body"].replace("240", "260")
+                report = await sync.sync()
+                print(f"{step}: {report.text if report else 'not modified'}")
+        finally:
+            await sync.stop()
+
+    section = next(s for s in store.catalog.snapshot.ordered_sections if s.name == DEFAULT_SECTION)
+    for subsection in store.catalog.snapshot.section_children(section.id):
+        for product in store.catalog.snapshot.subsection_children(subsection.id):
+            print(f"{subsection.name} {product.name}: {product.price} ₽")
+    store.db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_local_harness())
@@ -0,0 +1,83 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.types import TelegramObject
+
+
+class ChatEventIsolation(BaseEventIsolation):
+    def __init__(self, max_pending: int = 1000) -> None:
+        self.max_pending = max_pending
+        self.pending = 0
+        self._locks: dict[StorageKey, tuple[asyncio.Lock, int]] = {}
+        self._room = asyncio.Event()
+        self._room.set()
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+        self.pending += 1
+        if self.pending >= self.max_pending:
+            self._room.clear()
+        try:
+            async with lock:
+                yield
+        finally:
+            self.pending -= 1
+            if self.pending < self.max_pending:
+                self._room.set()
+            lock, users = self._locks.get(key, (lock, 1))
+            if users == 1:
+                self._locks.pop(key, None)
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    async def wait_for_room(self) -> None:
+        await self._room.wait()
+
+    async def close(self) -> None:
+        self._locks.clear()
+
+
+class UpdateLimiter(BaseMiddleware):
+    def __init__(self, max_concurrency: int = 64) -> None:
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self._slots:
+            self.running += 1
+            try:
+                return await handler(event, data)
+            finally:
+                self.running -= 1
+
+
+class PollingBackpressure(BaseRequestMiddleware):
+    def __init__(self, isolation: ChatEventIsolation) -> None:
+        self.isolation = isolation
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[Any],
+        bot: Bot,
+        method: TelegramMethod[Any],
+    ) -> Any:
+        if isinstance(method, GetUpdates):
+            await self.isolation.wait_for_room()
+        return await make_request(bot, method)
@@ -0,0 +1,91 @@
+import re
+import sqlite3
+
+from catalog import CatalogSnapshot
+
+
+CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+}
+MIN_TRIGRAM_QUERY = 3
+_TRANSLIT_TABLE = str.maketrans(CYRILLIC_TO_LATIN)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def transliterate(text: str) -> str:
+    return normalize(text).translate(_TRANSLIT_TABLE)
+
+
+def _document(subsection_name: str, product_name: str) -> str:
+    text = normalize(f"{subsection_name} {product_name}")
+    latin = transliterate(text)
+    return text if latin == text else f"{text} | {latin}"
+
+
+def rebuild_index(conn: sqlite3.Connection, snapshot: CatalogSnapshot) -> None:
+    conn.execute("DELETE FROM catalog_search")
+    conn.executemany(
+        "INSERT INTO catalog_search(product_id, body) VALUES (?, ?)",
+        [
+            (product.id, _document(snapshot.subsections[product.subsection_id].name, product.name))
+            for product in snapshot.products.values()
+        ],
+    )
+
+
+def index_is_current(conn: sqlite3.Connection, snapshot: CatalogSnapshot) -> bool:
+    indexed = conn.execute("SELECT COUNT(*) FROM catalog_search").fetchone()[0]
+    return indexed == len(snapshot.products)
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2) if " " not in text[i : i + 3]}
+
+
+def search_products(conn: sqlite3.Connection, query: str, limit: int, offset: int = 0) -> tuple[list[int], int]:
+    text = normalize(query)
+    if len(text) < MIN_TRIGRAM_QUERY:
+        return [], 0
+    variants = {text, transliterate(text)}
+
+    exact = " OR ".join(_phrase(variant) for variant in variants)
+    ids, total = _match(conn, exact, limit, offset)
+    if total:
+        return ids, total
+
+    grams = set().union(*(_trigrams(variant) for variant in variants))
+    if not grams:
+        return [], 0
+    fuzzy = " OR ".join(_phrase(gram) for gram in sorted(grams))
+    return _match(conn, fuzzy, limit, offset)
+
+
+def _match(conn: sqlite3.Connection, expression: str, limit: int, offset: int) -> tuple[list[int], int]:
+    total = conn.execute(
+        "SELECT COUNT(*) FROM catalog_search WHERE catalog_search MATCH ?",
+        (expression,),
+    ).fetchone()[0]
+    if not total:
+        return [], 0
+    rows = conn.execute(
+        """
+        SELECT product_id FROM catalog_search
+        WHERE catalog_search MATCH ?
+        ORDER BY bm25(catalog_search), product_id
+        LIMIT ? OFFSET ?
+        """,
+        (expression, limit, offset),
+    ).fetchall()
+    return [row[0] for row in rows], total
@@ -0,0 +1,153 @@
+import asyncio
+import copy
+import json
+import sqlite3
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import Settings
+from db import Database
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        db: Database,
+        flush_interval: float = 0.5,
+        batch_size: int = 200,
+        max_cached: int = 10_000,
+        key_builder: KeyBuilder | None = None,
+    ) -> None:
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_cached = max_cached
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self._records: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flush_task: asyncio.Task[None] | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _record(self, key: StorageKey) -> tuple[str, _Record]:
+        storage_key = self.key_builder.build(key)
+        record = self._records.get(storage_key)
+        if record is None:
+            loaded = await self.db.run(_load_record, storage_key)
+            record = self._records.setdefault(storage_key, loaded)
+            self._evict()
+        self._records.move_to_end(storage_key)
+        return storage_key, record
+
+    def _evict(self) -> None:
+        while len(self._records) > self.max_cached:
+            stale = next((key for key in self._records if key not in self._dirty), None)
+            if stale is None:
+                return
+            del self._records[stale]
+
+    def _mark_dirty(self, storage_key: str) -> None:
+        self._dirty.add(storage_key)
+        if len(self._dirty) >= self.batch_size:
+            self._schedule_flush(0)
+        else:
+            self._schedule_flush(self.flush_interval)
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            if delay > 0:
+                return
+            self._flush_task.cancel()
+        self._flush_task = asyncio.create_task(self._delayed_flush(delay))
+
+    async def _delayed_flush(self, delay: float) -> None:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await asyncio.shield(self.flush())
+        finally:
+            if self._dirty and self._flush_task is asyncio.current_task():
+                self._flush_task = None
+                self._schedule_flush(self.flush_interval)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch = [
+                (key, self._records[key].state, json.dumps(self._records[key].data, ensure_ascii=False))
+                for key in self._dirty
+                if key in self._records
+            ]
+            self._dirty.clear()
+            try:
+                await self.db.run(_save_records, batch)
+            except Exception:
+                self._dirty.update(row[0] for row in batch)
+                raise
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key, record = await self._record(key)
+        record.state = state.state if hasattr(state, "state") else state
+        self._mark_dirty(storage_key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        storage_key, record = await self._record(key)
+        record.data = json.loads(json.dumps(data))
+        self._mark_dirty(storage_key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, record = await self._record(key)
+        return copy.deepcopy(record.data)
+
+    async def close(self) -> None:
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+        await self.flush()
+
+
+def _load_record(conn: sqlite3.Connection, storage_key: str) -> _Record:
+    row = conn.execute("SELECT state, data FROM fsm_storage WHERE key = ?", (storage_key,)).fetchone()
+    if row is None:
+        return _Record()
+    return _Record(state=row["state"], data=json.loads(row["data"]))
+
+
+def _save_records(conn: sqlite3.Connection, batch: list[tuple[str, Optional[str], str]]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO fsm_storage(key, state, data) VALUES (?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data
+        """,
+        [row for row in batch if row[1] is not None or row[2] != "{}"],
+    )
+    conn.executemany(
+        "DELETE FROM fsm_storage WHERE key = ?",
+        [(row[0],) for row in batch if row[1] is None and row[2] == "{}"],
+    )
+
+
+def create_storage(settings: Settings, db: Database) -> BaseStorage:
+    if settings.fsm_storage == "memory":
+        return MemoryStorage()
+    if settings.fsm_storage == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as exc:
+            raise RuntimeError("FSM_STORAGE=redis requires the 'redis' package.") from exc
+        return RedisStorage.from_url(settings.redis_url)
+    return SQLiteStorage(db, flush_interval=settings.fsm_flush_interval)
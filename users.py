@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3
+
+from db import Database
+
+
+class UserRegistry:
+    def __init__(self, db: Database, flush_interval: float = 2.0, batch_size: int = 500) -> None:
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._seen: set[int] = set()
+        self._pending: list[int] = []
+        self._flush_task: asyncio.Task[None] | None = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def load(self) -> None:
+        self._seen.update(await self.db.run(_all_user_ids))
+
+    def register(self, user_id: int) -> None:
+        if user_id in self._seen:
+            return
+        self._seen.add(user_id)
+        self._pending.append(user_id)
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_task = asyncio.create_task(self._delayed_flush(0))
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush(self.flush_interval))
+
+    async def _delayed_flush(self, delay: float) -> None:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await asyncio.shield(self.flush())
+        finally:
+            if self._pending and self._flush_task is asyncio.current_task():
+                self._flush_task = asyncio.create_task(self._delayed_flush(self.flush_interval))
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                await self.db.run(_insert_users, batch)
+            except Exception:
+                self._pending.extend(batch)
+                raise
+
+    async def close(self) -> None:
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+        await self.flush()
+
+
+def _all_user_ids(conn: sqlite3.Connection) -> list[int]:
+    return [row[0] for row in conn.execute("SELECT user_id FROM users")]
+
+
+def _insert_users(conn: sqlite3.Connection, user_ids: list[int]) -> None:
+    conn.executemany("INSERT OR IGNORE INTO users(user_id) VALUES (?)", [(user_id,) for user_id in user_ids])
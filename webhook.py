@@ -0,0 +1,100 @@
+import asyncio
+import dataclasses
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import Settings
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, settings: Settings) -> web.Application:
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.webhook_secret,
+    ).register(app, path=settings.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, settings: Settings) -> None:
+    await serve_webhook_app(create_webhook_app(dp, bot, settings), bot, settings)
+
+
+async def serve_webhook_app(
+    app: web.Application,
+    bot: Bot,
+    settings: Settings,
+    allowed_updates: list[str] | None = None,
+) -> None:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.webapp_host, settings.webapp_port)
+    await site.start()
+    await bot.set_webhook(
+        settings.webhook_url.rstrip("/") + settings.webhook_path,
+        secret_token=settings.webhook_secret,
+        allowed_updates=allowed_updates,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def post_update(client: Any, settings: Settings, update: dict[str, Any], secret: str | None = None) -> int:
+    headers = {}
+    token = settings.webhook_secret if secret is None else secret
+    if token:
+        headers[SECRET_HEADER] = token
+    response = await client.post(settings.webhook_path, json=update, headers=headers)
+    return response.status
+
+
+async def run_local_harness() -> None:
+    import os
+    import tempfile
+
+    from aiohttp.test_utils import TestClient, TestServer
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "webhook.db")
+    import bot as store
+    from callbacks import SectionPage, SectionsPage
+    from fakes import FakeSession, callback_update, fake_bot, message_update
+
+    settings = dataclasses.replace(store.settings, webhook_secret="local-harness-secret")
+    session = FakeSession()
+    dp = store.build_dispatcher()
+    store.init_db()
+    app = create_webhook_app(dp, fake_bot(session), settings)
+
+    async with TestClient(TestServer(app)) as client:
+        updates = [
+            message_update(1001, "/start"),
+            callback_update(1001, SectionsPage().pack()),
+            callback_update(1001, SectionPage(section_id=1).pack()),
+        ]
+        for update in updates:
+            print(f"update {update['update_id']}: HTTP {await post_update(client, settings, update)}")
+        await asyncio.sleep(0.5)
+        handled = len(session.requests)
+        for secret in ("wrong", ""):
+            status = await post_update(client, settings, message_update(1001, "/start"), secret=secret)
+            print(f"secret {secret!r}: HTTP {status}")
+            assert status == 401, status
+        await asyncio.sleep(0.5)
+        assert len(session.requests) == handled, "update with a bad secret was processed"
+
+    store.db.close()
+    for method in session.requests:
+        print(type(method).__name__)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_local_harness())